@@ -0,0 +1,103 @@
+from math import sqrt
+from statistics import NormalDist
+
+# A cell is a grid point without its iteration. Iteration i of a cell is
+# the grid point (totalUtilization, i, critProb, ...), so every sample keeps
+# the task set it gets in a full grid sweep.
+
+def cellPoint(cell, iteration):
+    return (cell[0], iteration) + tuple(cell[1:])
+
+def pointCell(point):
+    return (point[0],) + tuple(point[2:])
+
+def isSuccess(result):
+    # Same criterion as the plot scripts
+    return result['scalingFactor'] >= 0
+
+def wilsonInterval(successes, total, z):
+    # Wilson score interval of a binomial proportion
+    if total == 0:
+        return 0.0, 1.0
+    ratio = successes/total
+    denominator = 1 + z*z/total
+    centre = (ratio + z*z/(2*total))/denominator
+    halfWidth = z*sqrt(ratio*(1 - ratio)/total + z*z/(4*total*total))/denominator
+    return max(0.0, centre - halfWidth), min(1.0, centre + halfWidth)
+
+
+class AdaptiveSampler():
+    # Draws task sets per cell in rounds until the Wilson interval of the
+    # schedulability ratio is at most 2*targetHalfWidth wide, or the cell
+    # has maxIterations samples. Every round sizes the next batch of a cell
+    # from its current estimate.
+    def __init__(self, config, completedResults=None):
+        self.minIterations = config.get('minIterations', 10)
+        self.maxIterations = config.get('maxIterations', config['numOfIterations'])
+        self.targetHalfWidth = config.get('targetHalfWidth', 0.05)
+        self.z = NormalDist().inv_cdf(0.5 + config.get('confidenceLevel', 0.95)/2)
+        # Results of points logged by earlier runs, point -> scalingFactor
+        self.completedResults = completedResults or dict()
+        self.successes = dict()
+        self.totals = dict()
+        self.done = dict()
+        self.numOfAnalyses = 0
+
+    def addCell(self, cell):
+        if cell in self.totals:
+            return
+        self.successes[cell] = 0
+        self.totals[cell] = 0
+        self.done[cell] = set()
+        for iteration in range(self.maxIterations):
+            scalingFactor = self.completedResults.get(cellPoint(cell, iteration))
+            if scalingFactor is not None:
+                self._add(cell, iteration, scalingFactor >= 0)
+
+    def _add(self, cell, iteration, success):
+        self.successes[cell] += success
+        self.totals[cell] += 1
+        self.done[cell].add(iteration)
+
+    def ratio(self, cell):
+        return self.successes[cell]/self.totals[cell] if self.totals[cell] else float('nan')
+
+    def interval(self, cell):
+        return wilsonInterval(self.successes[cell], self.totals[cell], self.z)
+
+    def isConverged(self, cell):
+        if self.totals[cell] >= self.maxIterations:
+            return True
+        if self.totals[cell] < self.minIterations:
+            return False
+        low, high = self.interval(cell)
+        return (high - low)/2 <= self.targetHalfWidth
+
+    def _batchSize(self, cell):
+        total = self.totals[cell]
+        if total < self.minIterations:
+            return self.minIterations - total
+        # Samples for the target width at the Agresti-Coull estimate of the
+        # ratio, at most doubling the cell per round
+        z2 = self.z*self.z
+        estimate = (self.successes[cell] + z2/2)/(total + z2)
+        needed = int(z2*estimate*(1 - estimate)/self.targetHalfWidth**2 - z2) + 1
+        return max(1, min(needed - total, total, self.maxIterations - total))
+
+    def sample(self, cells, evaluate):
+        # Generator over the results of every point evaluated for cells.
+        # evaluate(points) returns an iterable of evalGridPoint results in
+        # the order of points.
+        for cell in cells:
+            self.addCell(cell)
+        pending = [cell for cell in cells if not self.isConverged(cell)]
+        while pending:
+            points = list()
+            for cell in pending:
+                iterations = [iteration for iteration in range(self.maxIterations) if iteration not in self.done[cell]]
+                points.extend(cellPoint(cell, iteration) for iteration in iterations[:self._batchSize(cell)])
+            for point, result in zip(points, evaluate(points)):
+                self._add(pointCell(point), point[1], isSuccess(result))
+                self.numOfAnalyses += 1
+                yield result
+            pending = [cell for cell in pending if not self.isConverged(cell)]
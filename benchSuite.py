@@ -0,0 +1,219 @@
+import argparse
+import cProfile
+import gc
+import hashlib
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from numpy import random
+
+from taskGenerator import TaskGen
+from taskAnalyser import SchedulabilityTest, SolveStats
+
+# Fixed-seed corpora covering the axes the sweeps vary most: number of
+# tasks, utilization and period length. Every corpus is analysed against one
+# supply; 'Iterative' corpora also time the per-task generator.
+corpora = {
+    'smallN-lowU': dict(method='Uunifast', numOfTasks=3, totalUtilization=0.3, periodRange=(100, 1000), resourcePeriod=50),
+    'smallN-highU': dict(method='Uunifast', numOfTasks=3, totalUtilization=0.9, periodRange=(100, 1000), resourcePeriod=50),
+    'largeN-lowU': dict(method='Uunifast', numOfTasks=20, totalUtilization=0.3, periodRange=(100, 1000), resourcePeriod=50),
+    'largeN-highU': dict(method='Uunifast', numOfTasks=20, totalUtilization=0.9, periodRange=(100, 1000), resourcePeriod=50),
+    'shortPeriods': dict(method='Uunifast', numOfTasks=5, totalUtilization=0.6, periodRange=(10, 100), resourcePeriod=5),
+    'longPeriods': dict(method='Uunifast', numOfTasks=5, totalUtilization=0.6, periodRange=(1000, 10000), resourcePeriod=500),
+    'iterative': dict(method='Iterative', numOfTasks=2, totalUtilization=0.6, periodRange=(100, 1000), resourcePeriod=50),
+}
+
+# Functions whose time and call count are recorded from the profiles of
+# the analysis and of the generation
+profiledFunctions = ['_calcDeadlineV', '_calcL', '_QPA', '_dbf_CndA', '_dbf_CndB', '_dbf_CndC', '_dbf_CndD',
+    'dbfA', 'dbfB', 'dbfC', 'dbfD']
+generatorFunctions = {'Iterative': '_getUtilizationsIterative', 'Uunifast': '_getUtilizationsUunifastBatch'}
+dbfFunctions = ['_dbf_CndA', '_dbf_CndB', '_dbf_CndC', '_dbf_CndD', 'dbfA', 'dbfB', 'dbfC', 'dbfD']
+
+config = {'DEBUG': False, 'VERBOSE': False, 'epsilon': 1E-6}
+# Part of the baseline settings; bump it when the record layout changes
+recordFormat = 3
+budgetUtil = 0.95
+thetaRatio = 0.9
+
+
+def genCorpus(spec, numOfTaskSets, seed):
+    rng = random.default_rng(seed)
+    parameters = dict(numOfTasks=spec['numOfTasks'], totalUtilization=spec['totalUtilization'],
+        critProb=0.5, deadlineRatio=0.8, rate=0.5)
+    if spec['method'] == 'Iterative':
+        generator = TaskGen(rng)
+        return [generator.genTask('Iterative', wcetRatio=0.5, **parameters) for _ in range(numOfTaskSets)]
+    # Uunifast draws the HI utilization; wcetLO = wcetHI/wcetRatio
+    return TaskGen(rng).genTaskBatch('Uunifast', numOfTaskSets, wcetRatio=2, periodRange=spec['periodRange'], **parameters)
+
+
+def solveCorpus(corpus, spec, solveConfig):
+    resourcePeriod = spec['resourcePeriod']
+    thetaN = budgetUtil*resourcePeriod
+    scalingFactors = list()
+    solveStats = SolveStats()
+    for taskSet in corpus:
+        solver = SchedulabilityTest(taskSet, thetaN, thetaRatio*thetaN, resourcePeriod, solveConfig)
+        solver.solve()
+        scalingFactors.append(solver.scalingFactor)
+        if solver.stats is not None:
+            solveStats.add(solver.stats)
+    return scalingFactors, solveStats
+
+
+def profileStats(profiler, functionNames):
+    # (time, calls) per profiled function, summed over files
+    stats = dict()
+    for (_, _, functionName), (_, numOfCalls, _, cumulativeTime, _) in pstats.Stats(profiler).stats.items():
+        if functionName in functionNames:
+            time_, calls = stats.get(functionName, (0, 0))
+            stats[functionName] = (time_ + cumulativeTime, calls + numOfCalls)
+    return stats
+
+
+def runCorpus(name, spec, numOfTaskSets, seed, repeat, solveConfig):
+    record = dict()
+
+    generateTimes = list()
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        corpus = genCorpus(spec, numOfTaskSets, seed)
+        generateTimes.append(time.perf_counter() - startTime)
+    record['generateTime'] = min(generateTimes)
+
+    # One more generation under the profiler: time and calls of the
+    # utilization generator of the method in that run
+    generatorFunction = generatorFunctions[spec['method']]
+    profiler = cProfile.Profile()
+    profiler.enable()
+    genCorpus(spec, numOfTaskSets, seed)
+    profiler.disable()
+    functionTime, functionCalls = profileStats(profiler, [generatorFunction]).get(generatorFunction, (0.0, 0))
+    record['profiledGeneration'] = {'function': generatorFunction, 'functionTime': functionTime, 'functionCalls': functionCalls}
+
+    # Wall time without profiling or counters, best of repeat
+    solveTimes = list()
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        scalingFactors, _ = solveCorpus(corpus, spec, solveConfig)
+        solveTimes.append(time.perf_counter() - startTime)
+    record['solveTime'] = min(solveTimes)
+    # Any change of the decisions shows up as a different digest
+    record['resultDigest'] = hashlib.blake2b(json.dumps(scalingFactors).encode(), digest_size=8).hexdigest()
+    record['schedulable'] = sum(scalingFactor > 0 for scalingFactor in scalingFactors)
+
+    # One more solve of the same corpus, profiled and with SolveStats: the
+    # per-function times and calls and the solver counters of that run
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _, solveStats = solveCorpus(corpus, spec, dict(solveConfig, solveStats=True))
+    profiler.disable()
+    stats = profileStats(profiler, profiledFunctions)
+    functionCalls = {functionName: stats[functionName][1] for functionName in sorted(stats)}
+    record['profiledRun'] = {
+        'functionTime': {functionName: stats[functionName][0] for functionName in sorted(stats)},
+        'functionCalls': functionCalls,
+        'dbfCalls': sum(functionCalls.get(functionName, 0) for functionName in dbfFunctions),
+        'bisectionSteps': solveStats.bisectionSteps,
+        'qpaCalls': sum(solveStats.qpaCalls.values()),
+        'qpaIterations': sum(solveStats.qpaIterations.values()),
+        'sbfInvCalls': solveStats.sbfInvCalls,
+        }
+
+    gc.collect()
+    tracemalloc.start()
+    solveCorpus(corpus, spec, solveConfig)
+    record['peakMemory'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return record
+
+
+def compare(results, baseline, tolerance, minTime=0.01, minMemory=65536):
+    # Times and memory may grow by tolerance, counts and results must match.
+    # Growth below minTime seconds or minMemory bytes is timer and allocator
+    # noise.
+    regressions = list()
+    for name, record in results.items():
+        if name not in baseline:
+            continue
+        reference = baseline[name]
+        for key, minGrowth in [('generateTime', minTime), ('solveTime', minTime), ('peakMemory', minMemory)]:
+            if record[key] > max((1 + tolerance)*reference[key], reference[key] + minGrowth):
+                regressions.append('{}: {} {:.4g} -> {:.4g}'.format(name, key, reference[key], record[key]))
+        if record['resultDigest'] != reference['resultDigest']:
+            regressions.append('{}: resultDigest {} -> {}'.format(name, reference['resultDigest'], record['resultDigest']))
+        profiledRun, referenceRun = record['profiledRun'], reference['profiledRun']
+        for key in ['dbfCalls', 'bisectionSteps', 'qpaCalls', 'qpaIterations', 'sbfInvCalls']:
+            if profiledRun[key] != referenceRun[key]:
+                regressions.append('{}: {} of the profiled run {} -> {}'.format(name, key, referenceRun[key], profiledRun[key]))
+        functionTimes = dict(profiledRun['functionTime'])
+        referenceTimes = dict(referenceRun['functionTime'])
+        generation, referenceGeneration = record['profiledGeneration'], reference['profiledGeneration']
+        functionTimes[generation['function']] = generation['functionTime']
+        referenceTimes[referenceGeneration['function']] = referenceGeneration['functionTime']
+        if generation['functionCalls'] != referenceGeneration['functionCalls']:
+            regressions.append('{}: calls of {} in the profiled generation {} -> {}'.format(name, generation['function'],
+                referenceGeneration['functionCalls'], generation['functionCalls']))
+        for functionName, functionTime in functionTimes.items():
+            referenceTime = referenceTimes.get(functionName)
+            if referenceTime is not None and functionTime > max((1 + tolerance)*referenceTime, referenceTime + minTime):
+                regressions.append('{}: time of {} {:.4g} -> {:.4g}'.format(name, functionName, referenceTime, functionTime))
+    return regressions
+
+
+def printRecord(name, record, reference=None):
+    def change(key):
+        if reference is None or not reference.get(key):
+            return ''
+        return ' ({:+5.1f}%)'.format(100*(record[key]/reference[key] - 1))
+    profiledRun, generation = record['profiledRun'], record['profiledGeneration']
+    print('{:14s} | generate {:7.3f} s{}, profiled {} {:7.3f} s {:6d} calls | solve {:7.3f} s{} | profiled run: dbf {:7d} calls, QPA {:6d} calls {:7d} iterations {:6d} sbfInv steps | peak {:7.1f} kB{} | {:d} schedulable'.format(
+        name, record['generateTime'], change('generateTime'), generation['function'], generation['functionTime'],
+        generation['functionCalls'], record['solveTime'], change('solveTime'),
+        profiledRun['dbfCalls'], profiledRun['qpaCalls'], profiledRun['qpaIterations'], profiledRun['sbfInvCalls'], record['peakMemory']/1024, change('peakMemory'),
+        record['schedulable']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sets', type=int, default=200, help='task sets per corpus')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per corpus, the best one counts')
+    parser.add_argument('--corpora', nargs='*', default=list(corpora), choices=list(corpora))
+    parser.add_argument('--dbfEngine', default='scalar')
+    parser.add_argument('--baseline', default='benchBaseline.json')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative growth of times and memory')
+    args = parser.parse_args()
+
+    settings = {'sets': args.sets, 'seed': args.seed, 'dbfEngine': args.dbfEngine, 'format': recordFormat}
+    baseline = dict()
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, 'r') as fh:
+            baseline = json.load(fh)
+        # A baseline is only comparable for the same corpora
+        if baseline.get('settings') != settings:
+            print('Baseline {} was recorded with other settings, not comparing'.format(args.baseline))
+            baseline = dict()
+
+    solveConfig = dict(config, dbfEngine=args.dbfEngine)
+    results = dict()
+    for name in args.corpora:
+        results[name] = runCorpus(name, corpora[name], args.sets, args.seed, args.repeat, solveConfig)
+        printRecord(name, results[name], baseline.get('corpora', dict()).get(name))
+
+    if args.save:
+        with open(args.baseline, 'w') as fh:
+            json.dump({'settings': settings, 'corpora': results}, fh, indent=2)
+        print('Baseline written to {}'.format(args.baseline))
+    elif baseline:
+        regressions = compare(results, baseline['corpora'], args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
+        print('No regressions against {}'.format(args.baseline))
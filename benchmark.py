@@ -0,0 +1,157 @@
+import argparse
+import copy
+import subprocess
+import sys
+import time
+import numpy
+from numpy import random
+
+from taskGenerator import TaskGen
+from taskAnalyser import SchedulabilityTest, FailureException, analyseBatch
+import qpaKernels
+
+config = {'DEBUG': False, 'VERBOSE': False, 'epsilon': 1E-6}
+
+
+def genCorpus(numOfTaskSets, numOfTasks, seed=0):
+    rng = random.default_rng(seed)
+    corpus = list()
+    for _ in range(numOfTaskSets):
+        corpus.append(TaskGen(rng).genTask('Iterative',
+                numOfTasks=numOfTasks,
+                totalUtilization=rng.choice([0.2, 0.4, 0.6]),
+                critProb=0.5,
+                wcetRatio=0.5,
+                deadlineRatio=rng.choice([0.5, 0.7, 1.0]),
+                rate=0.5))
+    return corpus
+
+
+def benchSolve(corpus, dbfEngine, thetaN=50, thetaC=25, resourcePeriod=100, incrementalBisection=True):
+    engineConfig = dict(config, dbfEngine=dbfEngine, incrementalBisection=incrementalBisection)
+    scalingFactors = list()
+    dbfEvaluations = 0
+    startTime = time.perf_counter()
+    for taskSet in copy.deepcopy(corpus):
+        solver = SchedulabilityTest(taskSet, thetaN, thetaC, resourcePeriod, engineConfig)
+        solver.solve()
+        scalingFactors.append(solver.scalingFactor)
+        dbfEvaluations += solver.dbfEvaluations
+    return time.perf_counter() - startTime, scalingFactors, dbfEvaluations
+
+
+def benchBatch(corpus, thetaN=50, thetaC=25, resourcePeriod=100):
+    startTime = time.perf_counter()
+    scalingFactors = analyseBatch(corpus, thetaN, thetaC, resourcePeriod, config['epsilon'])
+    return time.perf_counter() - startTime, list(scalingFactors)
+
+
+def benchDbf(corpus, numOfPoints=1000, x=0.5):
+    # Time every condition's dbf over the same grid of interval lengths
+    lValues = numpy.arange(numOfPoints)
+    timings = dict()
+    for engine in ['scalar', 'array']:
+        solvers = [SchedulabilityTest(taskSet, 50, 25, 100, dict(config, dbfEngine=engine)) for taskSet in copy.deepcopy(corpus)]
+        for solver in solvers:
+            solver._setScaling(x)
+        for condition in 'ABCD':
+            startTime = time.perf_counter()
+            for solver in solvers:
+                dbf = getattr(solver, '_dbf_Cnd' + condition)
+                if engine == 'scalar':
+                    values = [dbf(lValue) for lValue in lValues]
+                else:
+                    values = dbf(lValues)
+            timings[(engine, condition)] = time.perf_counter() - startTime
+    return timings
+
+
+def benchQPA(corpus, engines, x=0.5):
+    # Time the QPA of every condition at one x, on the task sets that pass
+    # the utilization checks of _calcL
+    supplies = {'A': 'supplyN', 'B': 'supplyN', 'C': 'supplyC', 'D': 'supplyC'}
+    timings = dict()
+    outcomes = dict()
+    for engine in engines:
+        solvers = list()
+        for taskSet in copy.deepcopy(corpus):
+            solver = SchedulabilityTest(taskSet, 50, 25, 100, dict(config, dbfEngine=engine))
+            solver._setScaling(x)
+            try:
+                solver._calcL()
+            except FailureException:
+                continue
+            solvers.append(solver)
+        for condition in 'ABCD':
+            startTime = time.perf_counter()
+            outcomes[(engine, condition)] = [solver._QPA(getattr(solver, '_dbf_Cnd' + condition),
+                    getattr(solver, supplies[condition]), getattr(solver, 'l' + condition), condition=condition)
+                for solver in solvers]
+            timings[(engine, condition)] = time.perf_counter() - startTime
+    return timings, outcomes
+
+
+def benchImport(moduleName, repeat=5):
+    # Best-of-repeat import time of moduleName in a fresh interpreter, as a
+    # worker or rank pays it, and the heavy optional modules it pulled in
+    code = ('import sys, time; startTime = time.perf_counter(); import {:s}; '
+        'print(time.perf_counter() - startTime); '
+        'print(" ".join(name for name in ["matplotlib", "pandas", "seaborn", "numba"] if name in sys.modules))').format(moduleName)
+    elapsed = list()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split('\n')
+        elapsed.append(float(output[0]))
+    return min(elapsed), output[1].split()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sets', type=int, default=200)
+    parser.add_argument('--tasks', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('Import time in a fresh interpreter')
+    for moduleName in ['numpy', 'taskAnalyser', 'main']:
+        elapsed, heavyModules = benchImport(moduleName)
+        print('  {:12s}: {:6.1f} ms{}'.format(moduleName, 1000*elapsed,
+            ' | loads ' + ', '.join(heavyModules) if heavyModules else ''))
+
+    corpus = genCorpus(args.sets, args.tasks, args.seed)
+
+    print('solve() over {:d} task sets'.format(args.sets))
+    results = dict()
+    engines = ['scalar', 'array', 'jit'] if qpaKernels.JIT_AVAILABLE else ['scalar', 'array']
+    for engine in engines:
+        elapsed, results[engine], dbfEvaluations = benchSolve(corpus, engine)
+        print('  {:6s}: {:8.3f} s'.format(engine, elapsed))
+    elapsed, results['full'], fullEvaluations = benchSolve(corpus, 'scalar', incrementalBisection=False)
+    print('  {:6s}: {:8.3f} s (incrementalBisection off)'.format('scalar', elapsed))
+    print('  dbf evaluations: {:d} incremental, {:d} full, {:d} saved'.format(
+        dbfEvaluations, fullEvaluations, fullEvaluations - dbfEvaluations))
+    elapsed, results['batch'] = benchBatch(corpus)
+    print('  {:6s}: {:8.3f} s'.format('batch', elapsed))
+    for engine in engines[1:] + ['full', 'batch']:
+        if results['scalar'] != results[engine]:
+            print('  MISMATCH between scalar and {:s} scaling factors!'.format(engine))
+
+    print('dbf over 1000 interval lengths per task set')
+    timings = benchDbf(corpus)
+    for condition in 'ABCD':
+        print('  Condition {:s}: scalar {:8.3f} s | array {:8.3f} s | speedup {:6.1f}x'.format(
+            condition, timings[('scalar', condition)], timings[('array', condition)],
+            timings[('scalar', condition)]/timings[('array', condition)]))
+
+    if not qpaKernels.JIT_AVAILABLE:
+        print('QPA per condition: numba not available, jit engine skipped')
+    else:
+        # The first call compiles the kernels
+        benchQPA(corpus[:1], ['jit'])
+        print('QPA per condition at x = 0.5')
+        timings, outcomes = benchQPA(corpus, ['scalar', 'jit'])
+        for condition in 'ABCD':
+            print('  Condition {:s}: scalar {:8.3f} s | jit {:8.3f} s | speedup {:6.1f}x'.format(
+                condition, timings[('scalar', condition)], timings[('jit', condition)],
+                timings[('scalar', condition)]/timings[('jit', condition)]))
+            if outcomes[('scalar', condition)] != outcomes[('jit', condition)]:
+                print('  MISMATCH between scalar and jit outcomes of condition {:s}!'.format(condition))
@@ -0,0 +1,83 @@
+from math import ceil
+
+# A curve is a cell without its totalUtilization. For every curve and
+# threshold the search brackets the utilization where the schedulability
+# ratio drops below the threshold, by bisection over a lattice of
+# boundaryResolution steps between the smallest and largest of
+# totalUtilizations. The ratio of each visited cell comes from the
+# AdaptiveSampler, which also reuses cells shared by several thresholds.
+
+
+class BoundarySearch():
+    def __init__(self, config, sampler):
+        self.sampler = sampler
+        self.thresholds = sorted(config.get('boundaryThresholds', [0.5]), reverse=True)
+        self.resolution = config.get('boundaryResolution', 0.01)
+        self.minUtilization = min(config['totalUtilizations'])
+        self.maxUtilization = max(config['totalUtilizations'])
+        self.numOfSteps = max(1, int(ceil((self.maxUtilization - self.minUtilization)/self.resolution - 1E-9)))
+        # One row per curve and threshold once its search has ended
+        self.boundaries = list()
+
+    def utilization(self, step):
+        # Rounded so that the same lattice point is the same grid point
+        if step >= self.numOfSteps:
+            return self.maxUtilization
+        return round(self.minUtilization + step*self.resolution, 10)
+
+    def maxCells(self, numOfCurves):
+        # Upper bound of the cells visited, both ends and every bisection
+        # step of every threshold
+        return numOfCurves*(2 + len(self.thresholds)*self.numOfSteps.bit_length())
+
+    def _ratio(self, curve, step):
+        return self.sampler.ratio((self.utilization(step),) + curve)
+
+    def search(self, curves, evaluate):
+        # Generator over the results of every point evaluated; all searches
+        # advance together so that each round fills the workers
+        cells = [(self.utilization(step),) + curve for curve in curves for step in [0, self.numOfSteps]]
+        yield from self.sampler.sample(cells, evaluate)
+
+        active = list()
+        for curve in curves:
+            for threshold in self.thresholds:
+                if self._ratio(curve, 0) < threshold:
+                    self._addBoundary(curve, threshold, 0, 0, 'below')
+                elif self._ratio(curve, self.numOfSteps) >= threshold:
+                    self._addBoundary(curve, threshold, self.numOfSteps, self.numOfSteps, 'above')
+                else:
+                    active.append([curve, threshold, 0, self.numOfSteps])
+
+        while active:
+            cells = list(dict.fromkeys((self.utilization((lowStep + highStep)//2),) + curve
+                for curve, threshold, lowStep, highStep in active))
+            yield from self.sampler.sample(cells, evaluate)
+
+            stillActive = list()
+            for curve, threshold, lowStep, highStep in active:
+                midStep = (lowStep + highStep)//2
+                if self._ratio(curve, midStep) >= threshold:
+                    lowStep = midStep
+                else:
+                    highStep = midStep
+                if highStep - lowStep <= 1:
+                    self._addBoundary(curve, threshold, lowStep, highStep, 'inside')
+                else:
+                    stillActive.append([curve, threshold, lowStep, highStep])
+            active = stillActive
+
+    def _addBoundary(self, curve, threshold, lowStep, highStep, bracket):
+        # The crossing is interpolated linearly between the bracketing
+        # cells; 'below' and 'above' mark curves that cross outside the
+        # utilization range
+        lowUtilization, highUtilization = self.utilization(lowStep), self.utilization(highStep)
+        lowRatio, highRatio = self._ratio(curve, lowStep), self._ratio(curve, highStep)
+        utilization = lowUtilization
+        if bracket == 'inside' and lowRatio > highRatio:
+            utilization = lowUtilization + (lowRatio - threshold)/(lowRatio - highRatio)*(highUtilization - lowUtilization)
+        lowCell = (lowUtilization,) + curve
+        highCell = (highUtilization,) + curve
+        self.boundaries.append(dict(curve=curve, threshold=threshold, utilization=utilization, bracket=bracket,
+            lowUtilization=lowUtilization, highUtilization=highUtilization, lowRatio=lowRatio, highRatio=highRatio,
+            numOfSamples=self.sampler.totals[lowCell] + (self.sampler.totals[highCell] if highCell != lowCell else 0)))
@@ -1,132 +1,367 @@
+import argparse
 import itertools
 import json
-import sys
+import multiprocessing
 import os
-import pickle
-import datetime
+import signal
+import time
+from functools import partial
 from numpy import random
 
 from taskGenerator import TaskGen
-from taskAnalyser import SchedulabilityTest
-# from plotter import Logger
+from taskAnalyser import SchedulabilityTest, SolveStats
+from resultStore import ResultWriter, readResults
+from adaptiveSampler import AdaptiveSampler
+from boundarySearch import BoundarySearch
 
 defaultConfigFileName = 'sim.cfg'
-if len(sys.argv) > 1:
-    configFileName = sys.argv[1]
-else:
-    configFileName = defaultConfigFileName
-
-try:
-    with open(configFileName, 'r') as fh:
-        config = json.load(fh)
-        minThetaRatios = config['minThetaRatios']
-        minBudgetUtils = config['minBudgetUtils']
-        resourcePeriods = config['resourcePeriods']
-        critProbs = config['critProbs']
-        minWcetRatios = config['minWcetRatios']
-        minRates = config['minRates']
-        minDeadlineRatios = config['minDeadlineRatios']
-        totalUtilizations = config['totalUtilizations']
-        iterations = range(config['numOfIterations'])
-        numOfTasks = config['numOfTasks']
-except FileNotFoundError:
-    config = dict()
-    config['DEBUG'] = False
-    config['VERBOSE'] = False
-    config['epsilon'] = 1E-6
-    minThetaRatios = [1.0]
-    minBudgetUtils = [1.0]
-    resourcePeriods = [100]
-    critProbs = [0.5]
-    minWcetRatios = [1]
-    minRates = [0.1]
-    minDeadlineRatios = [0.8]
-    totalUtilizations = [0.8]
-    iterations = range(25)
-    numOfTasks = 2
-
-class Logger(list):
-    def __init__(self, logFolderName):
-        self.dirPathLog = os.path.join(os.getcwd(), logFolderName)
-        if not os.path.isdir(self.dirPathLog):
-            os.mkdir(self.dirPathLog)
-
-    def addLog(self, **kwargs):
-        self.append(kwargs)
-    
-    def dumpData(self):
-        print('Writing data ...')
-        filePathLog = os.path.join(self.dirPathLog, datetime.datetime.strftime(datetime.datetime.now(), 'log_%Y_%m_%d_%H_%M_%S_%f.pkl'))
-        with open(filePathLog, 'wb') as fh:
-            pickle.dump(self, fh)
-
-log = Logger(config['logFolder'])
-try:
-    counter = 0
-    for totalUtilization, iter, critProb, minWcetRatio, minDeadlineRatio, minThetaRatio, minBudgetUtil, resourcePeriod, minRate in itertools.product(
-        totalUtilizations, iterations, critProbs, minWcetRatios, minDeadlineRatios, minThetaRatios, minBudgetUtils, resourcePeriods, minRates):
-
-        # Task Parameters - Fixed Ratios
-        wcetRatio = minWcetRatio
-        rate = minRate
-        deadlineRatio = minDeadlineRatio
-
-        taskSet = TaskGen().genTask('Iterative',
-                numOfTasks=numOfTasks,
-                totalUtilization=totalUtilization,
-                critProb = critProb,
-                wcetRatio = wcetRatio,
-                deadlineRatio = deadlineRatio,
-                rate = rate)
-        
-        # Supply Parameters - Fixed Ratios
-        budgetUtil = minBudgetUtil
-        thetaRatio = minThetaRatio
-        thetaN = budgetUtil*resourcePeriod
-        thetaC = thetaRatio*thetaN
-
-        # thetaN = int(0.5*resourcePeriod)
-        # thetaC = thetaN
-        
-        solver = SchedulabilityTest(taskSet, thetaN, thetaC, resourcePeriod, config)
-        solver.solve()
-        if solver.scalingFactor == -1:
-            printFormat = 'U = {:5.3f} | #{:3d} | P = {:4.2f} | R = {:5.2f} | D = {:4.2f} | Tm = {:4.2f} | Bm = {:4.2f} | Pi = {:5d} | x = ----- <<< Fail!'
-        elif solver.scalingFactor == -2:
-            printFormat = 'U = {:5.3f} | #{:3d} | P = {:4.2f} | R = {:5.2f} | D = {:4.2f} | Tm = {:4.2f} | Bm = {:4.2f} | Pi = {:5d} | x = ----- <<< Fail! Infeasible rates'
-        elif solver.scalingFactor == -3:
-            printFormat = 'U = {:5.3f} | #{:3d} | P = {:4.2f} | R = {:5.2f} | D = {:4.2f} | Tm = {:4.2f} | Bm = {:4.2f} | Pi = {:5d} | x = ----- <<< Fail! Decrease epsilon'
-        else:
-            printFormat = 'U = {:5.3f} | #{:3d} | P = {:4.2f} | R = {:5.2f} | D = {:4.2f} | Tm = {:4.2f} | Bm = {:4.2f} | Pi = {:5d} | x = {:5.3f}'
-        
-        # print(printFormat.format(totalUtilization, iter, critProb, wcetRatio, minDeadlineRatio, solver.scalingFactor))
-        print(printFormat.format(totalUtilization, iter, critProb, wcetRatio, minDeadlineRatio, minThetaRatio, minBudgetUtil, resourcePeriod, solver.scalingFactor))
-        log.addLog(
-            minThetaRatio=minThetaRatio,
-            minBudgetUtil=minBudgetUtil,
-            resourcePeriod=resourcePeriod,
-            critProb=critProb,
-            wcetRatio=wcetRatio,
-            rate=rate,
-            minDeadlineRatio=minDeadlineRatio,
+
+def loadConfig(configFileName):
+    try:
+        with open(configFileName, 'r') as fh:
+            config = json.load(fh)
+    except FileNotFoundError:
+        config = dict()
+        config['DEBUG'] = False
+        config['VERBOSE'] = False
+        config['epsilon'] = 1E-6
+        config['minThetaRatios'] = [1.0]
+        config['minBudgetUtils'] = [1.0]
+        config['resourcePeriods'] = [100]
+        config['critProbs'] = [0.5]
+        config['minWcetRatios'] = [1]
+        config['minRates'] = [0.1]
+        config['minDeadlineRatios'] = [0.8]
+        config['totalUtilizations'] = [0.8]
+        config['numOfIterations'] = 25
+        config['numOfTasks'] = 2
+    return config
+
+def getGridPoints(config):
+    return list(itertools.product(
+        config['totalUtilizations'],
+        range(config['numOfIterations']),
+        config['critProbs'],
+        config['minWcetRatios'],
+        config['minDeadlineRatios'],
+        config['minThetaRatios'],
+        config['minBudgetUtils'],
+        config['resourcePeriods'],
+        config['minRates']))
+
+def getCells(config):
+    # Grid points without the iteration, for adaptive sampling
+    return list(itertools.product(
+        config['totalUtilizations'],
+        config['critProbs'],
+        config['minWcetRatios'],
+        config['minDeadlineRatios'],
+        config['minThetaRatios'],
+        config['minBudgetUtils'],
+        config['resourcePeriods'],
+        config['minRates']))
+
+def getCurves(config):
+    # Cells without the utilization, for the boundary search
+    return list(itertools.product(
+        config['critProbs'],
+        config['minWcetRatios'],
+        config['minDeadlineRatios'],
+        config['minThetaRatios'],
+        config['minBudgetUtils'],
+        config['resourcePeriods'],
+        config['minRates']))
+
+# Logged columns identifying a grid point, in the order of getGridPoints
+gridKeyColumns = ['totalUtilization', 'iteration', 'critProb', 'wcetRatio', 'minDeadlineRatio',
+    'minThetaRatio', 'minBudgetUtil', 'resourcePeriod', 'rate']
+
+def getCompletedPoints(logFolder):
+    # Every row in the result store is a completed grid point
+    if not os.path.isdir(logFolder):
+        return set()
+    columns = readResults(logFolder, gridKeyColumns)
+    return set(zip(*[columns[name].tolist() for name in gridKeyColumns]))
+
+def getCompletedResults(logFolder):
+    # Scaling factor of every grid point in the result store
+    if not os.path.isdir(logFolder):
+        return dict()
+    columns = readResults(logFolder, gridKeyColumns + ['scalingFactor'])
+    return dict(zip(zip(*[columns[name].tolist() for name in gridKeyColumns]), columns['scalingFactor'].tolist()))
+
+def getRankInfo():
+    # Rank and size of this process when launched through mpirun/srun.
+    # mpi4py is optional; the launcher environment variables are enough to
+    # partition the sweep since the ranks never need to communicate.
+    try:
+        from mpi4py import MPI
+        comm = MPI.COMM_WORLD
+        return comm.Get_rank(), comm.Get_size()
+    except ImportError:
+        pass
+    for rankVar, sizeVar in [
+            ('OMPI_COMM_WORLD_RANK', 'OMPI_COMM_WORLD_SIZE'),
+            ('PMI_RANK', 'PMI_SIZE')]:
+        if rankVar in os.environ and sizeVar in os.environ:
+            return int(os.environ[rankVar]), int(os.environ[sizeVar])
+    # The SLURM variables only describe this process inside an srun step; a
+    # batch script itself also sees SLURM_PROCID=0 and SLURM_NTASKS=N. The
+    # batch and extern steps have ids from 0xFFFFFFF0 on.
+    stepId = os.environ.get('SLURM_STEP_ID', '')
+    if stepId.isdigit() and int(stepId) < 0xFFFFFFF0 and 'SLURM_PROCID' in os.environ and 'SLURM_STEP_NUM_TASKS' in os.environ:
+        return int(os.environ['SLURM_PROCID']), int(os.environ['SLURM_STEP_NUM_TASKS'])
+    return 0, 1
+
+def getPointRng(rootSeed, point):
+    # Independent stream per grid point: the point's parameter values
+    # (scaled to integers) are the spawn key of the root SeedSequence, so a
+    # point draws the same task set whichever rank or worker evaluates it,
+    # and overlapping configs share task sets for common points.
+    spawnKey = tuple(int(round(value*1E6)) for value in point)
+    return random.default_rng(random.SeedSequence(entropy=rootSeed, spawn_key=spawnKey))
+
+def evalGridPoint(point, config):
+    totalUtilization, iter, critProb, minWcetRatio, minDeadlineRatio, minThetaRatio, minBudgetUtil, resourcePeriod, minRate = point
+
+    # Task Parameters - Fixed Ratios
+    wcetRatio = minWcetRatio
+    rate = minRate
+    deadlineRatio = minDeadlineRatio
+
+    taskSet = TaskGen(getPointRng(config.get('seed', 0), point)).genTask(config.get('taskGenMethod', 'Iterative'),
+            numOfTasks=config['numOfTasks'],
             totalUtilization=totalUtilization,
-            iteration=iter,
-            thetaC=thetaC,
-            thetaN=thetaN,
-            taskSet=None,
-            solver=None,
-            scalingFactor=solver.scalingFactor
-            )
-        
-        counter += 1
-        if counter>=10000:
-            counter = 0
-            log.dumpData()
-            del log
-            log = Logger(config['logFolder'])
-
-except Exception as e:
-    print('Error', e)
-    print('Unknown error, safely quitting ...')
-
-log.dumpData()
+            critProb = critProb,
+            wcetRatio = wcetRatio,
+            deadlineRatio = deadlineRatio,
+            rate = rate)
+
+    # Supply Parameters - Fixed Ratios
+    budgetUtil = minBudgetUtil
+    thetaRatio = minThetaRatio
+    thetaN = budgetUtil*resourcePeriod
+    thetaC = thetaRatio*thetaN
+
+    # thetaN = int(0.5*resourcePeriod)
+    # thetaC = thetaN
+
+    solver = SchedulabilityTest(taskSet, thetaN, thetaC, resourcePeriod, config)
+    solver.solve()
+    return dict(
+        minThetaRatio=minThetaRatio,
+        minBudgetUtil=minBudgetUtil,
+        resourcePeriod=resourcePeriod,
+        critProb=critProb,
+        wcetRatio=wcetRatio,
+        rate=rate,
+        minDeadlineRatio=minDeadlineRatio,
+        totalUtilization=totalUtilization,
+        iteration=iter,
+        thetaC=thetaC,
+        thetaN=thetaN,
+        taskSet=None,
+        solver=None,
+        scalingFactor=solver.scalingFactor,
+        cacheHit=solver.cacheHit,
+        resolvedBy=solver.resolvedBy,
+        solveStats=solver.stats
+        )
+
+def evalGridPoints(points, config, pool=None, workers=1, chunkSize=None):
+    # Results of points in their order, on the pool if there is one
+    if pool is None:
+        return (evalGridPoint(point, config) for point in points)
+    # Enough chunks per worker to balance load, few enough to keep the
+    # pickling overhead per grid point low.
+    chunkSize = chunkSize or max(1, min(256, len(points)//(8*workers)))
+    return pool.imap(partial(evalGridPoint, config=config), points, chunksize=chunkSize)
+
+def printResult(result):
+    if result['scalingFactor'] == -1:
+        printFormat = 'U = {:5.3f} | #{:3d} | P = {:4.2f} | R = {:5.2f} | D = {:4.2f} | Tm = {:4.2f} | Bm = {:4.2f} | Pi = {:5d} | x = ----- <<< Fail!'
+    elif result['scalingFactor'] == -2:
+        printFormat = 'U = {:5.3f} | #{:3d} | P = {:4.2f} | R = {:5.2f} | D = {:4.2f} | Tm = {:4.2f} | Bm = {:4.2f} | Pi = {:5d} | x = ----- <<< Fail! Infeasible rates'
+    elif result['scalingFactor'] == -3:
+        printFormat = 'U = {:5.3f} | #{:3d} | P = {:4.2f} | R = {:5.2f} | D = {:4.2f} | Tm = {:4.2f} | Bm = {:4.2f} | Pi = {:5d} | x = ----- <<< Fail! Decrease epsilon'
+    else:
+        printFormat = 'U = {:5.3f} | #{:3d} | P = {:4.2f} | R = {:5.2f} | D = {:4.2f} | Tm = {:4.2f} | Bm = {:4.2f} | Pi = {:5d} | x = {:5.3f}'
+
+    print(printFormat.format(
+        result['totalUtilization'], result['iteration'], result['critProb'], result['wcetRatio'], result['minDeadlineRatio'],
+        result['minThetaRatio'], result['minBudgetUtil'], result['resourcePeriod'], result['scalingFactor']))
+
+# Failure codes of SchedulabilityTest and their printed names
+errorNames = {-1: 'Fail', -2: 'Infeasible rates', -3: 'Decrease epsilon'}
+
+class ProgressReporter():
+    # Throughput, ETA, success ratio and failure counts, printed at most
+    # every interval seconds instead of one line per grid point
+    def __init__(self, numOfPoints, interval=30):
+        self.numOfPoints = numOfPoints
+        self.interval = interval
+        self.numOfResults = 0
+        self.numOfSchedulable = 0
+        self.errorCounts = dict.fromkeys(errorNames, 0)
+        self.startTime = time.monotonic()
+        self.lastReport = self.startTime
+
+    def update(self, result):
+        self.numOfResults += 1
+        if result['scalingFactor'] in self.errorCounts:
+            self.errorCounts[result['scalingFactor']] += 1
+        elif result['scalingFactor'] > 0:
+            self.numOfSchedulable += 1
+        now = time.monotonic()
+        if now - self.lastReport >= self.interval:
+            self.lastReport = now
+            self.report(now)
+
+    def report(self, now=None):
+        elapsed = (now or time.monotonic()) - self.startTime
+        rate = self.numOfResults/elapsed if elapsed > 0 else 0
+        remaining = self.numOfPoints - self.numOfResults
+        eta = '{:d}:{:02d}:{:02d}'.format(*self._hms(remaining/rate)) if rate > 0 else '--:--:--'
+        print('Progress: {:d}/{:d} ({:5.1f}%) | {:8.1f} points/s | ETA {:s} | schedulable {:5.3f} | {:s}'.format(
+            self.numOfResults, self.numOfPoints, 100*self.numOfResults/max(self.numOfPoints, 1), rate, eta,
+            self.numOfSchedulable/max(self.numOfResults, 1),
+            ', '.join('{:s} {:d}'.format(errorNames[code], count) for code, count in self.errorCounts.items())),
+            flush=True)
+
+    @staticmethod
+    def _hms(seconds):
+        seconds = int(seconds)
+        return seconds//3600, seconds//60 % 60, seconds % 60
+
+def handleTermination(signum, frame):
+    raise SystemExit('Terminated by signal {:d}'.format(signum))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('configFileName', nargs='?', default=defaultConfigFileName)
+    parser.add_argument('--workers', type=int, default=1,
+            help='number of worker processes per rank (default: 1, no pool)')
+    parser.add_argument('--chunksize', type=int, default=None,
+            help='grid points sent to a worker per batch')
+    parser.add_argument('--resume', action='store_true',
+            help='skip grid points already present in the log folder')
+    parser.add_argument('--verbose', action='store_true',
+            help='print one line per grid point')
+    parser.add_argument('--interval', type=float, default=30,
+            help='seconds between progress lines (default: 30)')
+    args = parser.parse_args()
+
+    config = loadConfig(args.configFileName)
+    logFolder = config.get('logFolder', 'logs')
+    rank, size = getRankInfo()
+
+    pool = multiprocessing.Pool(args.workers) if args.workers > 1 else None
+    evaluate = partial(evalGridPoints, config=config, pool=pool, workers=args.workers, chunkSize=args.chunksize)
+
+    sampler = None
+    search = None
+    if config.get('boundarySearch', False):
+        # Whole curves per rank; the cells of a curve are sampled adaptively
+        gridCurves = getCurves(config)
+        rankCurves = gridCurves[rank::size]
+        if size > 1:
+            print('Rank {:d} of {:d}: {:d} of {:d} curves'.format(rank, size, len(rankCurves), len(gridCurves)))
+        sampler = AdaptiveSampler(config, getCompletedResults(logFolder) if args.resume else None)
+        search = BoundarySearch(config, sampler)
+        numOfPoints = search.maxCells(len(rankCurves))*sampler.maxIterations
+        results = search.search(rankCurves, evaluate)
+    elif config.get('adaptiveSampling', False):
+        # Whole cells per rank, as the sampling of a cell depends on all its
+        # results. Logged points of a resumed run count towards their cell.
+        gridCells = getCells(config)
+        rankCells = gridCells[rank::size]
+        if size > 1:
+            print('Rank {:d} of {:d}: {:d} of {:d} cells'.format(rank, size, len(rankCells), len(gridCells)))
+        sampler = AdaptiveSampler(config, getCompletedResults(logFolder) if args.resume else None)
+        for cell in rankCells:
+            sampler.addCell(cell)
+        numOfPoints = len(rankCells)*sampler.maxIterations - sum(sampler.totals.values())
+        results = sampler.sample(rankCells, evaluate)
+    else:
+        # Round-robin slice of the grid: neighbouring points share the expensive
+        # utilization levels, so striding spreads them evenly over the ranks.
+        gridPoints = getGridPoints(config)
+        rankPoints = gridPoints[rank::size]
+        if size > 1:
+            print('Rank {:d} of {:d}: {:d} of {:d} grid points'.format(rank, size, len(rankPoints), len(gridPoints)))
+
+        # Completed points are filtered after slicing so that every rank keeps
+        # the same slice whatever the other ranks have written meanwhile
+        if args.resume:
+            completedPoints = getCompletedPoints(logFolder)
+            numOfPoints = len(rankPoints)
+            rankPoints = [point for point in rankPoints if point not in completedPoints]
+            print('Resuming: skipping {:d} of {:d} grid points already logged'.format(numOfPoints - len(rankPoints), numOfPoints))
+        numOfPoints = len(rankPoints)
+        results = evaluate(rankPoints)
+
+    # SLURM sends SIGTERM at the time limit; unwind so the last batch is
+    # written and a resumed run can continue from there. Installed after
+    # the pool is forked so the workers keep the default handler.
+    signal.signal(signal.SIGTERM, handleTermination)
+
+    # Per-point solve statistics are logged as extra columns and summed
+    # over the sweep
+    sweepStats = SolveStats() if config.get('solveStats', False) else None
+    log = ResultWriter(logFolder, rank, batchSize=config.get('logBatchSize', 500), withStats=sweepStats is not None)
+    cacheHits = 0
+    numOfResults = 0
+    resolvedCounts = dict.fromkeys(SchedulabilityTest.resolvedCounts, 0)
+    # With adaptive sampling numOfPoints is an upper bound and so is the ETA
+    progress = ProgressReporter(numOfPoints, args.interval)
+    completed = False
+    try:
+        for result in results:
+            if args.verbose:
+                printResult(result)
+            progress.update(result)
+            if sweepStats is not None:
+                sweepStats.add(result['solveStats'])
+                log.addLog(**result, **result['solveStats'].asDict())
+            else:
+                log.addLog(**result)
+            cacheHits += result['cacheHit']
+            resolvedCounts[result['resolvedBy']] += 1
+            numOfResults += 1
+        completed = True
+
+    except Exception as e:
+        print('Error', e)
+        print('Unknown error, safely quitting ...')
+    finally:
+        if pool is not None:
+            # Let finished workers exit normally so they commit their cache
+            if completed:
+                pool.close()
+                pool.join()
+            else:
+                pool.terminate()
+        log.dumpData()
+        progress.report()
+        if config.get('cacheFile'):
+            print('Cache: {:d} hits, {:d} misses'.format(cacheHits, numOfResults - cacheHits))
+        print('Resolved by: ' + ', '.join('{:s} {:d}'.format(tier, count) for tier, count in resolvedCounts.items()))
+        if search is not None:
+            log.dumpBoundaries(gridKeyColumns[2:] + ['threshold', 'utilization', 'bracket', 'lowUtilization',
+                    'highUtilization', 'lowRatio', 'highRatio', 'numOfSamples'],
+                [list(boundary['curve']) + [boundary[name] for name in ['threshold', 'utilization', 'bracket',
+                    'lowUtilization', 'highUtilization', 'lowRatio', 'highRatio', 'numOfSamples']]
+                 for boundary in sorted(search.boundaries, key=lambda boundary: (boundary['curve'], -boundary['threshold']))])
+            print('Boundary search: {:d} boundaries of {:d} curves'.format(
+                len(search.boundaries), len(rankCurves)))
+        if sampler is not None:
+            print('Adaptive sampling: {:d} analyses for {:d} cells, {:d} with a full grid of {:d} iterations'.format(
+                sampler.numOfAnalyses, len(sampler.totals), len(sampler.totals)*sampler.maxIterations, sampler.maxIterations))
+        if sweepStats is not None:
+            log.dumpStats(sweepStats.asDict())
+            print('Solve stats: {:d} bisection steps, {:d} QPA calls, {:d} QPA iterations, {:d} dbf calls, {:d} sbf calls, {:.3f} s in solve'.format(
+                sweepStats.bisectionSteps, sum(sweepStats.qpaCalls.values()), sum(sweepStats.qpaIterations.values()),
+                sweepStats.dbfCalls, sweepStats.sbfCalls + sweepStats.sbfInvCalls, sweepStats.phaseTimes['total']))
+
+if __name__ == '__main__':
+    main()
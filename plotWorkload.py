@@ -1,83 +1,13 @@
-from matplotlib import pyplot as plt
-import seaborn
 import os
-import pandas
-import pickle
-import datetime
 
-# from plotter import Plotter
-from matplotlib.font_manager import FontManager
-from matplotlib.font_manager import findSystemFonts
-from matplotlib import rcParams
-
-font_dirs = [os.path.join(os.getcwd(), 'fonts', 'Serif')]
-font_files = findSystemFonts(fontpaths=font_dirs)
-
-fm = FontManager()
-for path in font_files:
-    fm.addfont(path)
-    
-rcParams['font.family'] = 'Computer Modern Serif'
-rcParams['text.usetex'] = True
+from plotter import Plotter, plotModules
 
 dirPathPlot = os.path.join(os.getcwd(), 'plots')
 if not os.path.isdir(dirPathPlot):
     os.mkdir(dirPathPlot)
 
 
-class Logger(list):
-    def __init__(self, logFolderName):
-        self.dirPathLog = os.path.join(os.getcwd(), logFolderName)
-        if not os.path.isdir(self.dirPathLog):
-            os.mkdir(self.dirPathLog)
-
-    def addLog(self, **kwargs):
-        self.append(kwargs)
-    
-    def dumpData(self):
-        print('Writing data ...')
-        filePathLog = os.path.join(self.dirPathLog, datetime.datetime.strftime(datetime.datetime.now(), 'log_%Y_%m_%d_%H_%M_%S_%f.pkl'))
-        with open(filePathLog, 'wb') as fh:
-            pickle.dump(self, fh)
-
-
-class Plotter():
-    def __init__(self, logFolderName = 'logs'):
-        self.logFiles = []
-        dirPathLog = os.path.join(os.getcwd(), logFolderName)
-        for fileName in os.listdir(dirPathLog):
-            if fileName[-3:] == "pkl":
-                self.logFiles.append(fileName)
-        columnNames = ['Theta Ratio', 'Supply Budget Ratio', 'Resource Period', 'Crit Prob', 'WCET Ratio', 'Rate', 'Deadline Ratio', 'Average Utilization', 'Iteration', 'ThetaC', 'ThetaN', 'Scaling Factor']
-        self.database = pandas.DataFrame(columns=columnNames)
-
-        for selectedFile in self.logFiles:
-            with open(os.path.join(dirPathLog, selectedFile), 'rb') as fh:
-                self.simData = pickle.load(fh)
-            formattedSimData = []
-            for unitData in self.simData:
-                formattedSimData.append([
-                    unitData['minThetaRatio'],
-                    unitData['minBudgetUtil'],
-                    unitData['resourcePeriod'],
-                    unitData['critProb'],
-                    unitData['wcetRatio'],
-                    unitData['rate'],
-                    unitData['minDeadlineRatio'],
-                    unitData['totalUtilization'],
-                    unitData['iteration'],
-                    unitData['thetaC'],
-                    unitData['thetaN'],
-                    unitData['scalingFactor']
-                ])
-            self.database = pandas.concat(
-                objs = [self.database, pandas.DataFrame(data = formattedSimData, columns=columnNames)],
-                ignore_index = True)
-            del self.simData
-            del formattedSimData
-
-
-masterData = Plotter('logsWorkload')
+masterData = Plotter('logsWorkload', columns=['critProb', 'totalUtilization', 'minDeadlineRatio', 'rate', 'scalingFactor'])
 masterData = masterData.database.assign(scheduleSuccess=masterData.database["Scaling Factor"]>=0)
 
 
@@ -102,6 +32,7 @@ for plotIndex in masterData[pPlots].unique():
     numPlots = len(cColumns)
 
     for categoryIndex in range(numPlots):
+        plt, seaborn = plotModules()
         fig, ax = plt.subplots(figsize=(5, 3))
         plotData = resultsDF[resultsDF[pCategory] == cColumns[categoryIndex]].pivot(index=pIndex, columns=pColumns, values=pValues)
         seaborn.lineplot(
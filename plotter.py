@@ -1,54 +1,47 @@
 import os
-import datetime
-import pickle
 import pandas
 
-class Logger(list):
-    def __init__(self, logFolderName):
-        self.dirPathLog = os.path.join(os.getcwd(), logFolderName)
-        if not os.path.isdir(self.dirPathLog):
-            os.mkdir(self.dirPathLog)
+from resultStore import readResults
 
-    def addLog(self, **kwargs):
-        self.append(kwargs)
-    
-    def dumpData(self):
-        print('Writing data ...')
-        filePathLog = os.path.join(self.dirPathLog, datetime.datetime.strftime(datetime.datetime.now(), 'log_%Y_%m_%d_%H_%M_%S_%f.pkl'))
-        with open(filePathLog, 'wb') as fh:
-            pickle.dump(self, fh)
+_plotModules = None
+
+def plotModules():
+    # (pyplot, seaborn) with the serif fonts of fonts/Serif and LaTeX text.
+    # Imported and set up on the first figure, so reading and aggregating
+    # the results does not wait for matplotlib.
+    global _plotModules
+    if _plotModules is None:
+        import matplotlib
+        from matplotlib import font_manager
+        from matplotlib import pyplot
+        import seaborn
+        fontDirs = [os.path.join(os.getcwd(), 'fonts', 'Serif')]
+        for path in font_manager.findSystemFonts(fontpaths=fontDirs):
+            font_manager.fontManager.addfont(path)
+        matplotlib.rcParams['font.family'] = 'Computer Modern Serif'
+        matplotlib.rcParams['text.usetex'] = True
+        _plotModules = (pyplot, seaborn)
+    return _plotModules
 
 class Plotter():
-    def __init__(self, logFolderName = 'logs'):
-        self.logFiles = []
-        dirPathLog = os.path.join(os.getcwd(), logFolderName)
-        for fileName in os.listdir(dirPathLog):
-            if fileName[-3:] == "pkl":
-                self.logFiles.append(fileName)
-        columnNames = ['Theta Ratio', 'Supply Budget Ratio', 'Resource Period', 'Crit Prob', 'WCET Ratio', 'Rate', 'Deadline Ratio', 'Average Utilization', 'Iteration', 'ThetaC', 'ThetaN', 'Scaling Factor']
-        self.database = pandas.DataFrame(columns=columnNames)
+    columnNames = {
+        'minThetaRatio': 'Theta Ratio',
+        'minBudgetUtil': 'Supply Budget Ratio',
+        'resourcePeriod': 'Resource Period',
+        'critProb': 'Crit Prob',
+        'wcetRatio': 'WCET Ratio',
+        'rate': 'Rate',
+        'minDeadlineRatio': 'Deadline Ratio',
+        'totalUtilization': 'Average Utilization',
+        'iteration': 'Iteration',
+        'thetaC': 'ThetaC',
+        'thetaN': 'ThetaN',
+        'scalingFactor': 'Scaling Factor',
+        }
 
-        for selectedFile in self.logFiles:
-            with open(os.path.join(dirPathLog, selectedFile), 'rb') as fh:
-                self.simData = pickle.load(fh)
-            formattedSimData = []
-            for unitData in self.simData:
-                formattedSimData.append([
-                    unitData['minThetaRatio'],
-                    unitData['minBudgetUtil'],
-                    unitData['resourcePeriod'],
-                    unitData['critProb'],
-                    unitData['wcetRatio'],
-                    unitData['rate'],
-                    unitData['minDeadlineRatio'],
-                    unitData['totalUtilization'],
-                    unitData['iteration'],
-                    unitData['thetaC'],
-                    unitData['thetaN'],
-                    unitData['scalingFactor']
-                ])
-            self.database = pandas.concat(
-                objs = [self.database, pandas.DataFrame(data = formattedSimData, columns=columnNames)],
-                ignore_index = True)
-            del self.simData
-            del formattedSimData
+    def __init__(self, logFolderName = 'logs', columns=None, filters=None, workers=None):
+        # Reads both the columnar .npz shards and legacy .pkl logs. columns
+        # and filters use the logged field names, e.g.
+        # Plotter('logs', ['totalUtilization', 'scalingFactor'], {'rate': [0.3, 0.5]})
+        columns = readResults(logFolderName, columns, filters, workers)
+        self.database = pandas.DataFrame({self.columnNames[name]: column for name, column in columns.items()})
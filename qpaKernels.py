@@ -0,0 +1,105 @@
+from math import floor, ceil, fmod
+import numpy
+
+# Compiled QPA loop for SchedulabilityTest with dbfEngine 'jit'. The demand
+# bound and periodic supply bound functions repeat the float operations of
+# the scalar engine in the same order, so the decisions are identical.
+# numba is optional; without it the kernels stay plain Python functions and
+# SchedulabilityTest falls back to the scalar engine.
+try:
+    from numba import njit
+    JIT_AVAILABLE = True
+except ImportError:
+    JIT_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+# Condition numbers of the kernels
+conditionIds = {'A': 0, 'B': 1, 'C': 2, 'D': 3}
+
+
+@njit(cache=True)
+def sbfKernel(delta, pi, theta):
+    epsilon = max(0.0, delta - 2*(pi - theta) - pi*floor((delta - (pi - theta))/pi))
+    if delta <= 2*(pi - theta):
+        return 0.0
+    return floor((delta - (pi - theta))/pi)*theta + epsilon
+
+
+@njit(cache=True)
+def sbfInvKernel(supply, pi, theta):
+    if supply <= 0:
+        return 0.0
+    if (supply - theta*floor(supply/theta)) > 0:
+        epsilonT = pi - theta + supply - theta*floor(supply/theta)
+    else:
+        epsilonT = 0.0
+    return (pi - theta) + pi*floor(supply/theta) + epsilonT
+
+
+@njit(cache=True)
+def dbfKernel(condition, t, loWcetLO, loPeriod, loDeadline, loR,
+        hiWcetLO, hiWcetHI, hiPeriod, hiDeadline, hiDeadlineV):
+    # LO terms, accumulated in task order
+    lhsLO = 0.0
+    if condition == 0:
+        for i in range(loWcetLO.shape[0]):
+            lhsLO += max(0, floor((t - loDeadline[i])/loPeriod[i]) + 1)*loWcetLO[i]
+    elif condition == 1 or condition == 2:
+        for i in range(loWcetLO.shape[0]):
+            lhsLO += max(0, ceil(loR[i]*(floor((t - loDeadline[i])/loPeriod[i]) + 1)))*loWcetLO[i]
+
+    # HI terms: the virtual deadline ones for A and C, the carry-over ones
+    # after the mode switch for B and D
+    lhsHI = 0.0
+    if condition == 0 or condition == 2:
+        for i in range(hiWcetLO.shape[0]):
+            lhsHI += max(0, floor((t - hiDeadlineV[i])/hiPeriod[i]) + 1)*hiWcetLO[i]
+    else:
+        for i in range(hiWcetLO.shape[0]):
+            full = max(0, floor((t - (hiDeadline[i] - hiDeadlineV[i]))/hiPeriod[i]) + 1)*hiWcetHI[i]
+            n = fmod(t, hiPeriod[i])
+            done = 0.0
+            if (hiDeadline[i] - hiDeadlineV[i]) <= n and n <= hiDeadline[i]:
+                done = max(0.0, hiWcetLO[i] - n + hiDeadline[i] - hiDeadlineV[i])
+            lhsHI += full - done
+
+    if condition == 3:
+        return lhsHI
+    return lhsLO + lhsHI
+
+
+@njit(cache=True)
+def qpaKernel(condition, deadlines, minDeadline, pi, theta, loWcetLO, loPeriod, loDeadline, loR,
+        hiWcetLO, hiWcetHI, hiPeriod, hiDeadline, hiDeadlineV):
+    # SchedulabilityTest._QPA against a periodic resource. Returns 1 or 0
+    # for the outcome, -1 if no deadline is left before t, the number of
+    # dbf evaluations and the number of steps through sbfInv.
+    sbf_minDeadline = sbfKernel(float(minDeadline), pi, theta)
+    t = float(deadlines[-1]) if deadlines.shape[0] else 0.0
+    evaluations = 1
+    inverseSteps = 0
+    dbf_t = numpy.int64(dbfKernel(condition, t, loWcetLO, loPeriod, loDeadline, loR,
+            hiWcetLO, hiWcetHI, hiPeriod, hiDeadline, hiDeadlineV))
+    sbf_t = numpy.int64(sbfKernel(t, pi, theta))
+    while (0 <= (sbf_t - dbf_t)) and (dbf_t > sbf_minDeadline):
+        if 0 < (sbf_t - dbf_t):
+            t = sbfInvKernel(float(dbf_t), pi, theta)
+            inverseSteps += 1
+        else:
+            # Largest deadline strictly before t
+            index = numpy.searchsorted(deadlines, t)
+            if index == 0:
+                return -1, evaluations, inverseSteps
+            t = float(deadlines[index-1])
+        evaluations += 1
+        dbf_t = numpy.int64(dbfKernel(condition, t, loWcetLO, loPeriod, loDeadline, loR,
+                hiWcetLO, hiWcetHI, hiPeriod, hiDeadline, hiDeadlineV))
+        sbf_t = numpy.int64(sbfKernel(t, pi, theta))
+
+    if dbf_t <= sbf_minDeadline:
+        return 1, evaluations, inverseSteps
+    return 0, evaluations, inverseSteps
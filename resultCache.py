@@ -0,0 +1,113 @@
+import atexit
+import hashlib
+import multiprocessing.util
+import os
+import sqlite3
+import time
+import numpy
+
+# Part of every key; bump it whenever a change to the analysis can change
+# the scaling factor of an already cached (taskSet, supply) pair.
+cacheVersion = 4
+
+
+class ResultCache():
+    # On-disk memo of SchedulabilityTest results keyed by a hash of the task
+    # set columns and the supply parameters. Entries carry a last-used stamp
+    # and the least recently used ones are evicted beyond maxEntries.
+    # SQLite locking is unreliable on network filesystems, so point
+    # cacheFile at node-local storage when ranks run on several nodes.
+    _openCaches = dict()
+
+    def __init__(self, filePath, maxEntries=1000000, commitInterval=100):
+        self.filePath = filePath
+        self.maxEntries = maxEntries
+        self.commitInterval = commitInterval
+        self.hits = 0
+        self.misses = 0
+        # Writes are buffered and applied in one short transaction per
+        # commit, so concurrent workers never hold a lock between calls
+        self._pendingRows = dict()
+        dirPath = os.path.dirname(os.path.abspath(filePath))
+        os.makedirs(dirPath, exist_ok=True)
+        self.connection = sqlite3.connect(filePath, timeout=60, isolation_level=None)
+        # A lost cache entry only costs a recomputation
+        self.connection.execute('PRAGMA synchronous=OFF')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, scalingFactor REAL, lastUsed INTEGER)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS resultsLastUsed ON results (lastUsed)')
+
+    @classmethod
+    def open(cls, filePath, maxEntries=1000000):
+        # One connection per file and process
+        if filePath not in cls._openCaches:
+            cls._openCaches[filePath] = cls(filePath, maxEntries)
+            atexit.register(cls._openCaches[filePath].commit)
+            # Pool workers leave through os._exit and skip atexit, but run
+            # the multiprocessing finalizers when the pool is closed
+            multiprocessing.util.Finalize(None, cls._openCaches[filePath].commit, exitpriority=10)
+        return cls._openCaches[filePath]
+
+    @staticmethod
+    def key(taskSet, thetaN, thetaC, resourcePeriod, epsilon, variant=''):
+        tasks = list(taskSet.values())
+        columns = numpy.array(
+            [[task.wcetLO, task.wcetHI, task.period, task.deadline, task.r, task.criticality == 'HI'] for task in tasks],
+            dtype=numpy.float64)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(numpy.array([cacheVersion, len(tasks)], dtype=numpy.int64).tobytes())
+        digest.update(columns.tobytes())
+        digest.update(numpy.array([thetaN, thetaC, resourcePeriod, epsilon], dtype=numpy.float64).tobytes())
+        # Non-default analysis options; empty by default, keeping older keys
+        digest.update(variant.encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        if key in self._pendingRows:
+            scalingFactor = self._pendingRows[key]
+        else:
+            row = self.connection.execute('SELECT scalingFactor FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            scalingFactor = row[0]
+        self.hits += 1
+        self._written(key, scalingFactor)
+        # Failure codes are ints in SchedulabilityTest
+        return int(scalingFactor) if scalingFactor < 0 else scalingFactor
+
+    def put(self, key, scalingFactor):
+        self._written(key, float(scalingFactor))
+
+    def _written(self, key, scalingFactor):
+        self._pendingRows[key] = scalingFactor
+        if len(self._pendingRows) >= self.commitInterval:
+            self.commit()
+
+    def commit(self):
+        if not self._pendingRows:
+            return
+        lastUsed = time.time_ns()
+        # IMMEDIATE takes the write lock up front; a deferred transaction
+        # upgrading from a read lock can fail at once under contention
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            self.connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?)',
+                [(key, scalingFactor, lastUsed) for key, scalingFactor in self._pendingRows.items()])
+            numOfEntries = self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+            if numOfEntries > self.maxEntries:
+                # Evict down to 90% so eviction does not run on every commit
+                excess = numOfEntries - int(0.9*self.maxEntries)
+                self.connection.execute(
+                    'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY lastUsed LIMIT ?)', (excess,))
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self._pendingRows = dict()
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+        if ResultCache._openCaches.get(self.filePath) is self:
+            del ResultCache._openCaches[self.filePath]
+            atexit.unregister(self.commit)
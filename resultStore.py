@@ -0,0 +1,162 @@
+import csv
+import datetime
+import json
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+import numpy
+
+# One fixed-dtype column per logged field. Shards are plain .npz archives
+# of these columns, so reading them back never needs unpickling.
+resultSchema = [
+    ('minThetaRatio', numpy.float64),
+    ('minBudgetUtil', numpy.float64),
+    ('resourcePeriod', numpy.int64),
+    ('critProb', numpy.float64),
+    ('wcetRatio', numpy.float64),
+    ('rate', numpy.float64),
+    ('minDeadlineRatio', numpy.float64),
+    ('totalUtilization', numpy.float64),
+    ('iteration', numpy.int64),
+    ('thetaC', numpy.float64),
+    ('thetaN', numpy.float64),
+    ('scalingFactor', numpy.float64),
+    ]
+
+# Columns of SolveStats.asDict(), logged with config 'solveStats'
+statsSchema = [
+    ('bisectionSteps', numpy.int64),
+    ('dbfCalls', numpy.int64),
+    ('sbfCalls', numpy.int64),
+    ('sbfInvCalls', numpy.int64),
+    ] + [(name + condition, dtype) for condition in 'ABCD' for name, dtype in [
+    ('qpaCalls', numpy.int64),
+    ('qpaIterations', numpy.int64),
+    ('qpaTime', numpy.float64),
+    ('l', numpy.int64),
+    ('deadlineSetSize', numpy.int64),
+    ]] + [
+    ('preScreenTime', numpy.float64),
+    ('calcLTime', numpy.float64),
+    ('totalTime', numpy.float64),
+    ]
+
+
+class ResultWriter():
+    # Drop-in replacement for the pickled Logger lists. Rows are buffered in
+    # preallocated columns and every batchSize rows are written out as a new
+    # shard, so memory stays bounded and a crash loses at most one batch.
+    def __init__(self, logFolderName, rank=0, batchSize=500, withStats=False):
+        self.dirPathLog = os.path.join(os.getcwd(), logFolderName)
+        os.makedirs(self.dirPathLog, exist_ok=True)
+        self.rank = rank
+        self.batchSize = batchSize
+        self.filePrefix = 'results_r{:03d}_'.format(rank) + datetime.datetime.strftime(datetime.datetime.now(), '%Y_%m_%d_%H_%M_%S_%f')
+        self.numOfShards = 0
+        self.numOfRows = 0
+        self.schema = resultSchema + statsSchema if withStats else resultSchema
+        self.columns = {name: numpy.zeros(batchSize, dtype=dtype) for name, dtype in self.schema}
+
+    def addLog(self, **kwargs):
+        for name, _ in self.schema:
+            self.columns[name][self.numOfRows] = kwargs[name]
+        self.numOfRows += 1
+        if self.numOfRows >= self.batchSize:
+            self.flush()
+
+    def flush(self):
+        if self.numOfRows == 0:
+            return
+        filePathLog = os.path.join(self.dirPathLog, '{:s}_{:06d}.npz'.format(self.filePrefix, self.numOfShards))
+        # Write under a temporary name first so readers never see a
+        # partially written shard
+        filePathTemp = filePathLog + '.tmp'
+        with open(filePathTemp, 'wb') as fh:
+            numpy.savez(fh, **{name: column[:self.numOfRows] for name, column in self.columns.items()})
+        os.replace(filePathTemp, filePathLog)
+        self.numOfShards += 1
+        self.numOfRows = 0
+
+    def dumpData(self):
+        self.flush()
+
+    def dumpBoundaries(self, columnNames, rows):
+        # Boundary curves of a boundary search as CSV next to the shards
+        with open(os.path.join(self.dirPathLog, self.filePrefix + '_boundaries.csv'), 'w', newline='') as fh:
+            writer = csv.writer(fh)
+            writer.writerow(columnNames)
+            writer.writerows(rows)
+
+    def dumpStats(self, stats):
+        # Sweep totals next to the shards of this writer
+        with open(os.path.join(self.dirPathLog, self.filePrefix + '_stats.json'), 'w') as fh:
+            json.dump(stats, fh, indent=2)
+
+
+class _LegacyLogger(list):
+    # Stands in for Logger(list) of the old scripts; the pickle restores its
+    # dirPathLog attribute into the instance __dict__, which a plain list
+    # does not have
+    pass
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    # Old .pkl logs hold a pickled Logger(list) from whichever script wrote
+    # them; only its rows are read back.
+    def find_class(self, module, name):
+        if name == 'Logger':
+            return _LegacyLogger
+        return super().find_class(module, name)
+
+
+def _selectRows(columns, filters):
+    # filters maps a column to a single value, a list of values or a
+    # (low, high) tuple of inclusive bounds
+    mask = None
+    for name, condition in filters.items():
+        column = columns[name]
+        if isinstance(condition, tuple):
+            low, high = condition
+            selected = (column >= low) & (column <= high)
+        elif isinstance(condition, list):
+            selected = numpy.isin(column, condition)
+        else:
+            selected = column == condition
+        mask = selected if mask is None else mask & selected
+    return mask
+
+
+def readShard(filePath, columns=None, filters=None):
+    dtypes = dict(resultSchema + statsSchema)
+    filters = filters or dict()
+    names = list(columns or dict(resultSchema))
+    loadNames = names + [name for name in filters if name not in names]
+    if filePath.endswith('.npz'):
+        # npz members are only decompressed when accessed
+        with numpy.load(filePath, allow_pickle=False) as shard:
+            data = {name: shard[name].astype(dtypes[name], copy=False) for name in loadNames}
+    else:
+        with open(filePath, 'rb') as fh:
+            rows = _LegacyUnpickler(fh).load()
+        data = {name: numpy.array([row[name] for row in rows], dtype=dtypes[name]) for name in loadNames}
+    if filters:
+        mask = _selectRows(data, filters)
+        data = {name: column[mask] for name, column in data.items()}
+    return {name: data[name] for name in names}
+
+
+def readResults(logFolderName, columns=None, filters=None, workers=None):
+    # Reads every shard of a log folder on a thread pool and concatenates
+    # each column once. columns restricts the fields loaded, filters
+    # drops rows per shard before they are concatenated.
+    dtypes = dict(resultSchema + statsSchema)
+    names = list(columns or dict(resultSchema))
+    dirPathLog = os.path.join(os.getcwd(), logFolderName)
+    filePaths = [os.path.join(dirPathLog, fileName)
+                 for fileName in sorted(os.listdir(dirPathLog))
+                 if fileName.endswith('.npz') or fileName.endswith('.pkl')]
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        shards = list(executor.map(lambda filePath: readShard(filePath, names, filters), filePaths))
+    return {name: numpy.concatenate([shard[name] for shard in shards] or [numpy.zeros(0, dtype=dtypes[name])])
+            for name in names}
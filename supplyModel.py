@@ -0,0 +1,129 @@
+from abc import ABC, abstractmethod
+from math import floor
+import numpy
+
+# Supply bound functions of the resource models. Every model is built once
+# per parameter set and exposes sbf(delta) and sbfInv(supply), both taking a
+# scalar or a numpy array, and the linear lower bound
+# bandwidth*(delta - delay) used for the interval bounds. sbfInv(supply) is
+# the smallest delta with sbf(delta) >= supply, 0 for supply <= 0.
+
+
+class SupplyModel(ABC):
+    # Set by every model in its constructor
+    bandwidth = 0
+    delay = 0
+
+    @abstractmethod
+    def sbf(self, delta):
+        pass
+
+    @abstractmethod
+    def sbfInv(self, supply):
+        pass
+
+
+def periodicSbf(delta, pi, theta):
+    # Vectorized form of PeriodicResource.sbf, also used with one (pi, theta)
+    # per row by BatchSchedulabilityTest
+    epsilon = numpy.maximum(0, delta - 2*(pi - theta) - pi*numpy.floor((delta - (pi - theta))/pi))
+    return numpy.where(delta <= 2*(pi - theta), 0, numpy.floor((delta - (pi - theta))/pi)*theta + epsilon)
+
+
+def periodicSbfInv(supply, pi, theta):
+    quotient = numpy.floor(supply/theta)
+    epsilonT = numpy.where((supply - theta*quotient) > 0, pi - theta + supply - theta*quotient, 0)
+    return numpy.where(supply <= 0, 0, (pi - theta) + pi*quotient + epsilonT)
+
+
+class PeriodicResource(SupplyModel):
+    # Periodic resource model: theta units of supply every pi, with the
+    # worst case blackout of 2*(pi - theta)
+    def __init__(self, pi, theta):
+        self.pi = pi
+        self.theta = theta
+        self.bandwidth = theta/pi
+        self.delay = 2*(pi - theta)
+
+    def sbf(self, delta):
+        if isinstance(delta, numpy.ndarray):
+            return periodicSbf(numpy.asarray(delta, dtype=numpy.float64), self.pi, self.theta)
+        epsilon = max(0, delta-2*(self.pi - self.theta)-self.pi*floor((delta - (self.pi - self.theta))/self.pi))
+        if delta <= (2*(self.pi - self.theta)):
+            return 0
+        else:
+            return floor((delta - (self.pi - self.theta))/self.pi)*self.theta + epsilon
+
+    def sbfInv(self, supply):
+        if isinstance(supply, numpy.ndarray):
+            return periodicSbfInv(numpy.asarray(supply, dtype=numpy.float64), self.pi, self.theta)
+        if supply <= 0:
+            return 0
+        if (supply-self.theta*floor(supply/self.theta)) > 0:
+            epsilonT = self.pi - self.theta + supply - self.theta*floor(supply/self.theta)
+        else:
+            epsilonT = 0
+        return (self.pi - self.theta) + self.pi*floor(supply/self.theta) + epsilonT
+
+
+class ExplicitDeadlinePeriodic(SupplyModel):
+    # EDP model (Easwaran et al.): theta units every pi, delivered within
+    # the first supplyDeadline of each period. supplyDeadline = pi is the
+    # periodic resource model.
+    def __init__(self, pi, theta, supplyDeadline):
+        if not theta <= supplyDeadline <= pi:
+            raise ValueError('EDP model needs theta <= supplyDeadline <= pi')
+        self.pi = pi
+        self.theta = theta
+        self.supplyDeadline = supplyDeadline
+        self.bandwidth = theta/pi
+        self.delay = pi + supplyDeadline - 2*theta
+
+    def sbf(self, delta):
+        delta = numpy.asarray(delta, dtype=numpy.float64)
+        y = numpy.floor((delta - (self.supplyDeadline - self.theta))/self.pi)
+        value = numpy.where(delta >= self.supplyDeadline - self.theta,
+                y*self.theta + numpy.maximum(0, delta - self.delay - y*self.pi), 0)
+        return value if value.ndim else float(value)
+
+    def sbfInv(self, supply):
+        supply = numpy.asarray(supply, dtype=numpy.float64)
+        quotient = numpy.floor(supply/self.theta)
+        remainder = supply - self.theta*quotient
+        value = numpy.where(remainder > 0,
+                self.delay + self.pi*quotient + remainder,
+                (self.supplyDeadline - self.theta) + self.pi*quotient)
+        value = numpy.where(supply <= 0, 0, value)
+        return value if value.ndim else float(value)
+
+
+class BoundedDelay(SupplyModel):
+    # Bounded-delay model: supply at rate bandwidth after at most delay
+    def __init__(self, bandwidth, delay):
+        self.bandwidth = bandwidth
+        self.delay = delay
+
+    def sbf(self, delta):
+        value = numpy.maximum(0, self.bandwidth*(numpy.asarray(delta, dtype=numpy.float64) - self.delay))
+        return value if value.ndim else float(value)
+
+    def sbfInv(self, supply):
+        supply = numpy.asarray(supply, dtype=numpy.float64)
+        value = numpy.where(supply <= 0, 0, supply/self.bandwidth + self.delay)
+        return value if value.ndim else float(value)
+
+
+def makeSupply(config, pi, theta):
+    # Supply model for a (pi, theta) budget as selected by the config
+    supplyModel = config.get('supplyModel', 'periodic')
+    if supplyModel == 'periodic':
+        return PeriodicResource(pi, theta)
+    if supplyModel == 'edp':
+        supplyDeadline = max(theta, config.get('supplyDeadlineRatio', 1.0)*pi)
+        if supplyDeadline >= pi:
+            return PeriodicResource(pi, theta)
+        return ExplicitDeadlinePeriodic(pi, theta, supplyDeadline)
+    if supplyModel == 'boundedDelay':
+        # Linear lower bound of the periodic resource with the same budget
+        return BoundedDelay(theta/pi, 2*(pi - theta))
+    raise ValueError('Unknown supplyModel: ' + str(supplyModel))
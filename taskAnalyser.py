@@ -1,11 +1,13 @@
 from math import floor, ceil
 from math import fmod as mod
+import numpy
 from numpy import abs
 from numpy import int64
-
-from matplotlib import pyplot as plt
+import time
 
 from taskGenerator import TaskSet
+from resultCache import ResultCache
+from supplyModel import makeSupply, periodicSbf, periodicSbfInv, PeriodicResource
 
 USE_QPA = True
 
@@ -32,112 +34,120 @@ class FailureException(Exception):
         return 'FailureException: ' + self.message
 
 class QPA():
-    def __init__(self, taskSet, debug=False):
+    # Quick Processor-demand Analysis (Zhang & Burns) for EDF on a dedicated
+    # processor. mode 'LO' checks every task with its LO budget, mode 'HI'
+    # the HI tasks with their HI budgets. The demand h(t) is evaluated on
+    # the task columns and the absolute deadlines are kept in a sorted index.
+    def __init__(self, taskSet, mode='LO', debug=False):
+        if mode == 'LO':
+            self.wcet = taskSet.wcetLO
+            self.period = taskSet.period
+            self.deadline = taskSet.deadline
+        elif mode == 'HI':
+            self.wcet = taskSet.wcetHI[taskSet.hi]
+            self.period = taskSet.period[taskSet.hi]
+            self.deadline = taskSet.deadline[taskSet.hi]
+        else:
+            raise ValueError('Unknown QPA mode: ' + str(mode))
 
-        # Warning for tasks with offsets
-        for task in taskSet.values():
-            if task.offset != 0:
-                raise Exception("Offsets not supported!")
-        
         self.lbRecurrenceLimit = 1E3
-        self.taskSet = taskSet
+        self.utilizations = self.wcet/self.period
+        self.totalUtilization = self.utilizations.sum()
 
         # Checking if the taskset has arbitrary deadlines
-        self.arbitraryDeadlines = False
-        for task in taskSet.values():
-            if task.deadline > task.period:
-                self.arbitraryDeadlines = True
-        
+        self.arbitraryDeadlines = bool((self.deadline > self.period).any())
+
         self.debug = debug
-    
+
     def solve(self):
 
-        if self.taskSet.totalUtilization > 1:
-            print('Not schedulable')
+        if self.totalUtilization > 1:
+            if self.debug:
+                print('Not schedulable')
             return False
+        if len(self.wcet) == 0:
+            return True
 
-        minDeadline = min([task.deadline for task in self.taskSet.values()])
-        if self.taskSet.totalUtilization < 1:
-            La2, La4, La9 = self.La_2(), self.La_4(), self.La_9()
+        # Density test, sufficient and much cheaper than the full analysis
+        if (self.wcet/numpy.minimum(self.deadline, self.period)).sum() <= 1:
             if self.debug:
-                print('La2 = {:6.3f} | La4 = {:6.3f} | La9 = {:6.3f}'.format(La2, La4, La9))
-            La = La4
+                print('Schedulable by density')
+            return True
+
+        minDeadline = self.deadline.min()
+        if self.totalUtilization < 1:
+            La = self.La_4()
             Lb = self.Lb()
             lValue = min(La, Lb)
+            if self.debug:
+                print('La2 = {:6.3f} | La4 = {:6.3f} | La9 = {:6.3f}'.format(self.La_2(), La, self.La_9()))
         else:
             Lb = self.Lb()
             lValue = Lb
 
         if self.debug:
-            print('La2 = {:6.3f} | La4 = {:6.3f} | La9 = {:6.3f}'.format(La2, La4, La9))
             print('Lb                           : {:6.3f}'.format(Lb))
             print('min(La, Lb)                  : {:6.3f}'.format(lValue))
-        
-        deadlines = set()
-        for task in self.taskSet.values():
-            t = 0
-            while (t + task.deadline) < lValue:
-                deadlines.add(t + task.deadline)
-                t += task.period
-        
+
+        deadlines = self.deadlineIndex(lValue)
+
         if self.debug:
             print('Number of deadlines to check : {}'.format(len(deadlines)))
-            print('Min deadline                 : {}'.format(min(deadlines, default=None)))
-        t = max(deadlines, default=0)
+            print('Min deadline                 : {}'.format(minDeadline))
+        t = deadlines[-1] if len(deadlines) else 0
         h_at_t = self.h(t)
 
         if self.debug:
-            print('t = {:8d} | h(t) = {:8d}'.format(t, h_at_t))
+            print('t = {:8.0f} | h(t) = {:8.0f}'.format(t, h_at_t))
 
         while (h_at_t <= t) and (h_at_t > minDeadline):
             if h_at_t < t:
                 t = h_at_t
             else:
-                t = max([d for d in deadlines if d<t])
+                # Largest deadline strictly before t
+                index = numpy.searchsorted(deadlines, t)
+                if index == 0:
+                    raise ValueError('No deadline before t = {}'.format(t))
+                t = deadlines[index-1]
             h_at_t = self.h(t)
             if self.debug:
-                print('t = {:8d} | h(t) = {:8d}'.format(t, h_at_t))
+                print('t = {:8.0f} | h(t) = {:8.0f}'.format(t, h_at_t))
 
         if h_at_t <= minDeadline:
-            print('Schedulable')
+            if self.debug:
+                print('Schedulable')
             return True
         else:
-            print('Not schedulable')
-            return False        
+            if self.debug:
+                print('Not schedulable')
+            return False
+
+    def deadlineIndex(self, lValue):
+        # Sorted absolute deadlines below lValue
+        return numpy.unique(numpy.concatenate(
+            [numpy.arange(deadline, lValue, period) for deadline, period in zip(self.deadline.tolist(), self.period.tolist())]))
 
-    
     def h(self, t):
-        value = 0
-        for task in self.taskSet.values():
-            value += max(0, 1+floor((t - task.deadline)/task.period))*task.wcet
-        return value
-    
+        return (numpy.maximum(0, 1 + numpy.floor((t - self.deadline)/self.period))*self.wcet).sum()
+
     def La_2(self):
         # Equation (2)
-        maxDeadline = max([task.deadline for task in self.taskSet.values()])
-        laValue = max(maxDeadline, max([task.period - task.deadline for task in self.taskSet.values()])*self.taskSet.totalUtilization/(1-self.taskSet.totalUtilization))
-        return laValue
+        return max(self.deadline.max(), (self.period - self.deadline).max()*self.totalUtilization/(1-self.totalUtilization))
 
     def La_3(self):
         # Equation (3)
         # Only for constrained and implicit deadline taskset
-        # Check for arbitrary deadlines
         if self.arbitraryDeadlines:
             raise Exception('Can not use La_3 function for arbitrary deadlines')
-        laValue = sum([(task.period - task.deadline)*task.utilization for task in self.taskSet.values()])/(1-self.taskSet.totalUtilization)
-        return laValue
+        return ((self.period - self.deadline)*self.utilizations).sum()/(1-self.totalUtilization)
 
     def La_4(self):
         # Equation (4)
-        maxDeadline = max([task.deadline for task in self.taskSet.values()])
-        laValue = max(maxDeadline, sum([(task.period - task.deadline)*task.utilization for task in self.taskSet.values()])/(1-self.taskSet.totalUtilization))
-        return laValue
-    
+        return max(self.deadline.max(), ((self.period - self.deadline)*self.utilizations).sum()/(1-self.totalUtilization))
+
     def La_9(self):
         # Equation (9)
-        laValue = max([task.deadline-task.period for task in self.taskSet.values()])
-        laValue = max(laValue, sum([(task.period - task.deadline)*task.utilization for task in self.taskSet.values()])/(1-self.taskSet.totalUtilization))
-        return laValue
+        return max((self.deadline - self.period).max(), ((self.period - self.deadline)*self.utilizations).sum()/(1-self.totalUtilization))
 
     def Lb(self):
         # Equations (5) & (6)
@@ -149,34 +159,287 @@ class QPA():
             work = self.calculateWork(prevWork)
             lbRecurrenceCount += 1
         return work
-    
+
     def calculateWork(self, previousWork=None):
         if previousWork is None:
-            return sum([task.wcet for task in self.taskSet.values()])
+            return self.wcet.sum()
         else:
-            return sum([ceil(previousWork/task.period)*task.wcet for task in self.taskSet.values()])
+            return (numpy.ceil(previousWork/self.period)*self.wcet).sum()
+
+
+class DemandArrays():
+    # Column-wise copy of a task set for evaluating the demand bound
+    # functions of all four conditions on a whole vector of interval
+    # lengths at once. The arithmetic mirrors the scalar _dbf_* methods of
+    # SchedulabilityTest term by term, and the per-task terms are
+    # accumulated in task order, so both paths give identical values.
+    def __init__(self, taskSet):
+        self.loWcetLO = self._column(taskSet.wcetLO[taskSet.lo])
+        self.loPeriod = self._column(taskSet.period[taskSet.lo])
+        self.loDeadline = self._column(taskSet.deadline[taskSet.lo])
+        self.loR = self._column(taskSet.r[taskSet.lo])
+        self.hiWcetLO = self._column(taskSet.wcetLO[taskSet.hi])
+        self.hiWcetHI = self._column(taskSet.wcetHI[taskSet.hi])
+        self.hiPeriod = self._column(taskSet.period[taskSet.hi])
+        self.hiDeadline = self._column(taskSet.deadline[taskSet.hi])
+        self.hiDeadlineV = self.hiDeadline.copy()
+
+    def _column(self, values):
+        return values.astype(numpy.float64).reshape(-1, 1)
+
+    def setScaling(self, x):
+        self.hiDeadlineV = x*self.hiDeadline
+
+    def _evaluate(self, lValue, termsLO, termsHI):
+        t = numpy.asarray(lValue, dtype=numpy.float64)
+        tRow = t.reshape(1, -1)
+        lhs = self._sumRows(termsLO(tRow)) if termsLO else 0
+        lhs = lhs + self._sumRows(termsHI(tRow))
+        if t.ndim == 0:
+            return lhs[0]
+        return lhs.reshape(t.shape)
+
+    def _sumRows(self, terms):
+        # Sequential accumulation, same order as sum() over the generator
+        lhs = numpy.zeros(terms.shape[1])
+        for row in terms:
+            lhs = lhs + row
+        return lhs
+
+    def _dbf_LO_SM1(self, t):
+        return numpy.maximum(0, numpy.floor((t - self.loDeadline)/self.loPeriod) + 1)*self.loWcetLO
+
+    def _dbf_HI_SM1(self, t):
+        return numpy.maximum(0, numpy.floor((t - self.hiDeadlineV)/self.hiPeriod) + 1)*self.hiWcetLO
+
+    def _dbf_LO_SM2(self, t):
+        return numpy.maximum(0, numpy.ceil(self.loR*(numpy.floor((t - self.loDeadline)/self.loPeriod) + 1)))*self.loWcetLO
+
+    def _dbf_HI_SM2w(self, t):
+        full = numpy.maximum(0, numpy.floor((t - (self.hiDeadline - self.hiDeadlineV))/self.hiPeriod) + 1)*self.hiWcetHI
+        n = numpy.fmod(t, self.hiPeriod)
+        window = ((self.hiDeadline - self.hiDeadlineV) <= n) & (n <= self.hiDeadline)
+        done = numpy.where(window, numpy.maximum(0, self.hiWcetLO - n + self.hiDeadline - self.hiDeadlineV), 0)
+        return full - done
+
+    def dbfA(self, lValue):
+        return self._evaluate(lValue, self._dbf_LO_SM1, self._dbf_HI_SM1)
+
+    def dbfB(self, lValue):
+        return self._evaluate(lValue, self._dbf_LO_SM2, self._dbf_HI_SM2w)
+
+    def dbfC(self, lValue):
+        return self._evaluate(lValue, self._dbf_LO_SM2, self._dbf_HI_SM1)
+
+    def dbfD(self, lValue):
+        return self._evaluate(lValue, None, self._dbf_HI_SM2w)
+
+
+class SolveStats():
+    # Opt-in counters and timers of one solve (config 'solveStats'), or of
+    # several after add(). Updated once per QPA call and per phase, never
+    # per dbf evaluation. Horizons and deadline set sizes keep the largest
+    # value seen, everything else is summed.
+    def __init__(self):
+        self.numOfSolves = 0
+        self.bisectionSteps = 0
+        self.qpaCalls = dict.fromkeys('ABCD', 0)
+        self.qpaIterations = dict.fromkeys('ABCD', 0)
+        self.qpaTimes = dict.fromkeys('ABCD', 0.0)
+        self.horizons = dict.fromkeys('ABCD', 0)
+        self.deadlineSetSizes = dict.fromkeys('ABCD', 0)
+        self.sbfCalls = 0
+        self.sbfInvCalls = 0
+        self.phaseTimes = dict.fromkeys(['preScreen', 'calcL', 'total'], 0.0)
+
+    @property
+    def dbfCalls(self):
+        # The QPA loop evaluates the dbf once per iteration
+        return sum(self.qpaIterations.values())
+
+    def addQPA(self, condition, iterations, inverseSteps, deadlineSetSize, elapsed):
+        self.qpaCalls[condition] += 1
+        self.qpaIterations[condition] += iterations
+        self.qpaTimes[condition] += elapsed
+        self.deadlineSetSizes[condition] = max(self.deadlineSetSizes[condition], deadlineSetSize)
+        # sbf(t) per iteration and sbf(minDeadline) once per call
+        self.sbfCalls += iterations + 1
+        self.sbfInvCalls += inverseSteps
+
+    def addHorizons(self, horizons):
+        for condition, lValue in horizons.items():
+            self.horizons[condition] = max(self.horizons[condition], lValue)
+
+    def add(self, other):
+        self.numOfSolves += other.numOfSolves
+        self.bisectionSteps += other.bisectionSteps
+        for condition in 'ABCD':
+            self.qpaCalls[condition] += other.qpaCalls[condition]
+            self.qpaIterations[condition] += other.qpaIterations[condition]
+            self.qpaTimes[condition] += other.qpaTimes[condition]
+            self.deadlineSetSizes[condition] = max(self.deadlineSetSizes[condition], other.deadlineSetSizes[condition])
+        self.addHorizons(other.horizons)
+        self.sbfCalls += other.sbfCalls
+        self.sbfInvCalls += other.sbfInvCalls
+        for phase, elapsed in other.phaseTimes.items():
+            self.phaseTimes[phase] += elapsed
+
+    def asDict(self):
+        # Flat field names, as used for the result columns
+        fields = dict(numOfSolves=self.numOfSolves, bisectionSteps=self.bisectionSteps,
+            dbfCalls=self.dbfCalls, sbfCalls=self.sbfCalls, sbfInvCalls=self.sbfInvCalls)
+        for condition in 'ABCD':
+            fields['qpaCalls' + condition] = self.qpaCalls[condition]
+            fields['qpaIterations' + condition] = self.qpaIterations[condition]
+            fields['qpaTime' + condition] = self.qpaTimes[condition]
+            fields['l' + condition] = self.horizons[condition]
+            fields['deadlineSetSize' + condition] = self.deadlineSetSizes[condition]
+        for phase, elapsed in self.phaseTimes.items():
+            fields[phase + 'Time'] = elapsed
+        return fields
 
 
 class SchedulabilityTest():
     DEBUG = False
+    # Number of solves decided by each tier of solve(), per process
+    resolvedCounts = {tier: 0 for tier in ['cache', 'utilization', 'qpa', 'density', 'spotCheck', 'bisection']}
     VERBOSE = False
+    _jitFallbackReported = False
     def __init__(self, taskSet, thetaN, thetaC, resourcePeriod, config=None):
         SchedulabilityTest.DEBUG = config['DEBUG']
         SchedulabilityTest.VERBOSE = config['VERBOSE']
         self.pi = resourcePeriod
         self.thetaN = thetaN
         self.thetaC = thetaC
-        self.wN = thetaN/resourcePeriod
-        self.wC = thetaC/resourcePeriod
         self.taskSet = taskSet
         self.epsilon = config['epsilon']
 
+        # Supply in normal (N) and critical (C) mode
+        self.supplyN = makeSupply(config, resourcePeriod, thetaN)
+        self.supplyC = makeSupply(config, resourcePeriod, thetaC)
+        self.wN = self.supplyN.bandwidth
+        self.wC = self.supplyC.bandwidth
+
+        # 'scalar' evaluates the demand bound functions task by task,
+        # 'array' evaluates them column-wise through DemandArrays, 'jit'
+        # additionally runs the QPA loop against a periodic resource in the
+        # compiled kernels of qpaKernels (needs numba, else 'scalar' is used)
+        self.dbfEngine = config.get('dbfEngine', 'scalar')
+        if self.dbfEngine == 'jit':
+            # Only 'jit' pays for importing numba
+            import qpaKernels
+            self._kernels = qpaKernels
+        if self.dbfEngine == 'jit' and not self._kernels.JIT_AVAILABLE:
+            if not SchedulabilityTest._jitFallbackReported:
+                print('numba not available, dbfEngine jit falls back to scalar')
+                SchedulabilityTest._jitFallbackReported = True
+            self.dbfEngine = 'scalar'
+        if self.dbfEngine in ['array', 'jit']:
+            self.demand = DemandArrays(taskSet)
+            self._dbf_CndA = self.demand.dbfA
+            self._dbf_CndB = self.demand.dbfB
+            self._dbf_CndC = self.demand.dbfC
+            self._dbf_CndD = self.demand.dbfD
+        elif self.dbfEngine == 'scalar':
+            self.demand = None
+        else:
+            raise ValueError('Unknown dbfEngine: ' + str(self.dbfEngine))
+
+        # Absolute deadlines only depend on the task deadlines and periods,
+        # so one sorted index serves every condition and bisection step
+        self._deadlines = numpy.empty(0, dtype=numpy.int64)
+        self._deadlineHorizon = 0
+        self._minDeadline = min(taskSet.deadline.tolist())
+
+        # Task views per criticality, and the virtual deadlines of the HI
+        # tasks for the current x. The task set itself is never modified.
+        self.tasksLO = [task for task in taskSet.values() if task.criticality == 'LO']
+        self.tasksHI = [task for task in taskSet.values() if task.criticality == 'HI']
+        self.deadlinesV = [task.deadline for task in self.tasksHI]
+
+        # Incremental bisection: only evaluate the conditions the decision
+        # table needs, and reuse outcomes implied by monotonicity in x
+        self.incrementalBisection = config.get('incrementalBisection', True)
+
+        # Necessary condition checked before the bisection: demand bound A
+        # is at least the LO-mode demand for every x, and sbf_N(t) <= t, so
+        # if the LO-mode demand is not EDF schedulable on a dedicated
+        # processor, condition A fails for every x
+        self.qpaPrefilter = config.get('qpaPrefilter', True)
+        # Sufficient density test for the first bisection step
+        self.densityScreen = config.get('densityScreen', True)
+        self.resolvedBy = None
+        self.bisectionSteps = 0
+        # Optional per-solve counters and timers
+        self.stats = SolveStats() if config.get('solveStats', False) else None
+
+        # Optional on-disk memo of (taskSet, supply) results
+        if config.get('cacheFile'):
+            self.cache = ResultCache.open(config['cacheFile'], config.get('cacheMaxEntries', 1000000))
+        else:
+            self.cache = None
+        self.cacheHit = False
+        self._lConstants = None
+        # Optionally cap the utilization-based horizons by the busy period
+        # of each condition; lSources records which bound was used
+        self.busyPeriodHorizon = config.get('busyPeriodHorizon', False)
+        self._busyPeriods = None
+        self.lSources = dict()
+
+        # Options that change results are part of the cache key
+        variant = list()
+        if config.get('supplyModel', 'periodic') != 'periodic':
+            variant.append('{}:{}'.format(config['supplyModel'], config.get('supplyDeadlineRatio', 1.0)))
+        if self.busyPeriodHorizon:
+            variant.append('busyPeriodHorizon')
+        if not self.qpaPrefilter:
+            variant.append('noQpaPrefilter')
+        self.cacheVariant = ';'.join(variant)
+        self.dbfEvaluations = 0
+        self.skippedConditions = 0
+        self._cndnBounds = {
+            'A': {'true': float('inf'), 'false': float('-inf')},
+            'B': {'true': float('-inf'), 'false': float('inf')},
+            'C': {'true': float('inf'), 'false': float('-inf')},
+            'D': {'true': float('-inf'), 'false': float('inf')}}
+
 
     def solve(self):
+        if self.stats is not None:
+            startTime = time.perf_counter()
+            self._solve()
+            self.stats.numOfSolves = 1
+            self.stats.bisectionSteps = self.bisectionSteps
+            self.stats.phaseTimes['total'] = time.perf_counter() - startTime
+        else:
+            self._solve()
+
+    def _solve(self):
+        if self.cache is not None:
+            cacheKey = ResultCache.key(self.taskSet, self.thetaN, self.thetaC, self.pi, self.epsilon, self.cacheVariant)
+            scalingFactor = self.cache.get(cacheKey)
+            if scalingFactor is not None:
+                self.scalingFactor = scalingFactor
+                self.cacheHit = True
+                self.resolvedBy = 'cache'
+                SchedulabilityTest.resolvedCounts['cache'] += 1
+                return
+
         try:
-            self.scalingFactor = self._calcDeadlineV(self.epsilon)
+            if self.stats is not None:
+                startTime = time.perf_counter()
+                try:
+                    scalingFactor = self._preScreen()
+                finally:
+                    self.stats.phaseTimes['preScreen'] += time.perf_counter() - startTime
+            else:
+                scalingFactor = self._preScreen()
+            if scalingFactor is None:
+                scalingFactor = self._calcDeadlineV(self.epsilon)
+            self.scalingFactor = scalingFactor
             if self.VERBOSE:
                 print('Schedulable with deadline scaling factor {}'.format(self.scalingFactor))
+                print('Horizons: ' + ', '.join('l{} from {}'.format(condition, source) for condition, source in sorted(self.lSources.items())))
         except FailureException as e:
             self.scalingFactor = -1
             if self.VERBOSE:
@@ -189,6 +452,13 @@ class SchedulabilityTest():
             self.scalingFactor = -3
             if self.VERBOSE:
                 print(e)
+        # Decided in _calcDeadlineV: the first step is the spot check at x=0.5
+        if self.resolvedBy is None:
+            self.resolvedBy = 'spotCheck' if self.bisectionSteps <= 1 else 'bisection'
+        SchedulabilityTest.resolvedCounts[self.resolvedBy] += 1
+
+        if self.cache is not None:
+            self.cache.put(cacheKey, self.scalingFactor)
         
         if self.DEBUG:
             try:
@@ -199,73 +469,181 @@ class SchedulabilityTest():
             except AttributeError:
                 pass
     
-    def _calcL(self, precisionLimit = 1E-6):
+    def _preScreen(self):
+        # O(n) tiers in front of the exact analysis. Raises for points that
+        # fail, returns the scaling factor for points that are decided and
+        # None otherwise. The bisection only runs if epsilon <= 0.5; above
+        # that the result is -3 whatever the task set, so nothing is decided
+        # here.
+        if self.epsilon > 0.5:
+            return None
+        # The x-independent utilization checks of _calcL
+        self.resolvedBy = 'utilization'
+        self._calcLConstants()
+        if self.qpaPrefilter:
+            self.resolvedBy = 'qpa'
+            if not QPA(self.taskSet, 'LO').solve():
+                raise FailureException('LO-mode demand not schedulable on a dedicated processor')
+        self.resolvedBy = None
+        if self.densityScreen and self._densityTest(0.5):
+            # All four conditions hold at the first bisection step
+            self.resolvedBy = 'density'
+            return 0.5
+        return None
+
+    def _densityTest(self, x):
+        # Sufficient test for all four conditions at x. Each demand term is
+        # at most wcet*t/min(deadline, period) from its first deadline on
+        # and zero before, the sbf is at least bandwidth*(t - delay), and
+        # the carry-over term of the HI tasks in B and D is dropped as it
+        # only lowers the demand. ceil(r*n) <= ceil(r)*n bounds the rate
+        # terms.
+        termsLO = [(task.wcetLO, task.deadline, task.period) for task in self.tasksLO]
+        termsLOr = [(ceil(task.r)*task.wcetLO, task.deadline, task.period) for task in self.tasksLO]
+        termsHI = [(task.wcetLO, x*task.deadline, task.period) for task in self.tasksHI]
+        termsHIw = [(task.wcetHI, task.deadline - x*task.deadline, task.period) for task in self.tasksHI]
+        for supply, terms in [
+                (self.supplyN, termsLO + termsHI),
+                (self.supplyN, termsLOr + termsHIw),
+                (self.supplyC, termsLOr + termsHI),
+                (self.supplyC, termsHIw)]:
+            if not terms:
+                continue
+            firstDeadline = min(deadline for _, deadline, _ in terms)
+            if firstDeadline <= 0:
+                return False
+            density = sum(wcet/min(deadline, period) for wcet, deadline, period in terms)
+            # Slack so that rounding cannot turn a near miss into a pass
+            if not density*(1 + 1E-9) < supply.bandwidth:
+                return False
+            if not firstDeadline*(supply.bandwidth - density*(1 + 1E-9)) >= supply.bandwidth*supply.delay:
+                return False
+        return True
+
+    def _calcLConstants(self):
+        # Everything in _calcL that does not depend on x, evaluated once
+        # per solve. The utilization checks raise from _preScreen, or on
+        # the first bisection step when it is skipped.
+        if self._lConstants is not None:
+            return self._lConstants
         c1 = self.taskSet.totalUtilization_LO_LO
         c2 = self.taskSet.totalUtilization_LO_HI
-        c3 = sum(task.r*task.wcetLO/task.period for task in self.taskSet.values() if task.criticality=='LO')
+        c3 = sum(task.r*task.wcetLO/task.period for task in self.tasksLO)
         c4 = self.taskSet.totalUtilization_HI_HI
-        
-        if c1 + c2 < self.wN:
-        # if precisionLimit < abs(self.wN - (c1 + c2)):
-            num = 0
-            num += c1*max([task.period - task.deadline  for task in self.taskSet.values() if task.criticality == 'LO'], default=0)
-            num += c2*max([task.period - task.deadlineV for task in self.taskSet.values() if task.criticality == 'HI'], default=0)
-            num += 2*self.wN*(self.pi - self.thetaN)
-            den = self.wN - c1 - c2
-            self.lA = int(ceil(num/den))
-        else:
+
+        if not c1 + c2 < self.wN:
             if self.VERBOSE:
                 print("The condition 'c1 + c2 < wn' is not satisfied!")
             raise FailureException('Failed while calculating l_max for Condition A')
-        
-        if c3 + c4 < self.wN:
-        # if precisionLimit < abs(self.wN - (c3 + c4)):
-            num = 0
-            num += c3*max([task.period - task.deadline + task.period/task.r for task in self.taskSet.values() if task.criticality == 'LO'], default=0)
-            num += c4*max([task.period - (task.deadline - task.deadlineV) for task in self.taskSet.values() if task.criticality == 'HI'], default=0)
-            num += 2*self.wN*(self.pi - self.thetaN)
-            den = self.wN - c3 - c4
-            self.lB = int(ceil(num/den))
-        else:
+        if not c3 + c4 < self.wN:
             if self.VERBOSE:
                 print("The condition 'c3 + c4 < wn' is not satisfied!")
             raise FailureException('Failed while calculating l_max for Condition B')
-        
-        if c2 + c3 < self.wN:
-        # if precisionLimit < abs(self.wN - (c2 + c3)):
-            num = 0
-            num += c2*max([task.period - task.deadlineV for task in self.taskSet.values() if task.criticality == 'HI'], default=0)
-            num += c3*max([task.period - task.deadline + task.period/task.r for task in self.taskSet.values() if task.criticality == 'LO'], default=0)
-            num += 2*self.wC*(self.pi - self.thetaC)
-            den = self.wC - c2 - c3
-            self.lC = int(ceil(num/den))
-        else:
+        if not c2 + c3 < self.wN:
             if self.VERBOSE:
                 print("The condition 'c2 + c3 < wc' is not satisfied!")
             raise FailureException('Failed while calculating l_max for Condition C')
-        
-        if c3 < self.wC:
-        # if precisionLimit < abs(self.wC - (c3)):
-            num = 0
-            num += c3*max([task.period - task.deadline + task.period/task.r for task in self.taskSet.values() if task.criticality == 'LO'], default=0)
-            num += 2*self.wC*(self.pi - self.thetaC)
-            den = self.wC - c3
-            self.lD = int(ceil(num/den))
-        else:
+        if not c3 < self.wC:
             if self.VERBOSE:
                 print("The condition 'c3 < wc' is not satisfied!")
             raise FailureException('Failed while calculating l_max for Condition D')
-    
+
+        termLO = c1*max([task.period - task.deadline  for task in self.tasksLO], default=0)
+        termLOr = c3*max([task.period - task.deadline + task.period/task.r for task in self.tasksLO], default=0)
+        supplyN = self.wN*self.supplyN.delay
+        supplyC = self.wC*self.supplyC.delay
+
+        num = 0
+        num += termLOr
+        num += supplyC
+        lD = int(ceil(num/(self.wC - c3)))
+
+        self._lConstants = (c1, c2, c3, c4, termLO, termLOr, supplyN, supplyC, lD)
+        return self._lConstants
+
+    def _calcL(self, precisionLimit = 1E-6):
+        c1, c2, c3, c4, termLO, termLOr, supplyN, supplyC, lD = self._calcLConstants()
+        maxHIv = max([task.period - deadlineV for task, deadlineV in zip(self.tasksHI, self.deadlinesV)], default=0)
+        maxHIc = max([task.period - (task.deadline - deadlineV) for task, deadlineV in zip(self.tasksHI, self.deadlinesV)], default=0)
+
+        num = 0
+        num += termLO
+        num += c2*maxHIv
+        num += supplyN
+        self.lA = self._horizon('A', int(ceil(num/(self.wN - c1 - c2))))
+
+        num = 0
+        num += termLOr
+        num += c4*maxHIc
+        num += supplyN
+        self.lB = self._horizon('B', int(ceil(num/(self.wN - c3 - c4))))
+
+        num = 0
+        num += c2*maxHIv
+        num += termLOr
+        num += supplyC
+        self.lC = self._horizon('C', int(ceil(num/(self.wC - c2 - c3))))
+
+        self.lD = self._horizon('D', lD)
+
+    def _horizon(self, condition, utilizationBound):
+        if self.busyPeriodHorizon:
+            if self._busyPeriods is None:
+                self._busyPeriods = self._calcBusyPeriods()
+            busyPeriod = self._busyPeriods[condition]
+            if busyPeriod < utilizationBound:
+                self.lSources[condition] = 'busyPeriod'
+                return int(ceil(busyPeriod))
+        self.lSources[condition] = 'utilization'
+        return utilizationBound
+
+    def _calcBusyPeriods(self, maxIterations=1000):
+        # Synchronous busy period of every condition against its supply: an
+        # L with W(L) <= sbf(L), where W(a) is the demand of all jobs
+        # released in a window of length a. As dbf(a + b) <= W(a) + dbf(b)
+        # and the sbf is superadditive, dbf(t) <= sbf(t) for all t < L
+        # implies it for all t. The HI terms of B and D carry one extra
+        # wcetLO for the job that is partially done at the mode switch.
+        # The horizon is independent of x and computed once per solve.
+        jobsLO = lambda lValue: sum(ceil(lValue/task.period)*task.wcetLO for task in self.tasksLO)
+        jobsLOr = lambda lValue: sum(ceil(task.r*ceil(lValue/task.period))*task.wcetLO for task in self.tasksLO)
+        jobsHI = lambda lValue: sum(ceil(lValue/task.period)*task.wcetLO for task in self.tasksHI)
+        jobsHIw = lambda lValue: sum(ceil(lValue/task.period)*task.wcetHI + task.wcetLO for task in self.tasksHI)
+        utilLO = sum(task.wcetLO/task.period for task in self.tasksLO)
+        utilLOr = sum(task.r*task.wcetLO/task.period for task in self.tasksLO)
+        utilHI = sum(task.wcetLO/task.period for task in self.tasksHI)
+        utilHIw = sum(task.wcetHI/task.period for task in self.tasksHI)
+        workloads = {
+            'A': (self.supplyN, lambda lValue: jobsLO(lValue) + jobsHI(lValue), utilLO + utilHI),
+            'B': (self.supplyN, lambda lValue: jobsLOr(lValue) + jobsHIw(lValue), utilLOr + utilHIw),
+            'C': (self.supplyC, lambda lValue: jobsLOr(lValue) + jobsHI(lValue), utilLOr + utilHI),
+            'D': (self.supplyC, jobsHIw, utilHIw)}
+
+        busyPeriods = dict()
+        for condition, (supply, workload, utilization) in workloads.items():
+            busyPeriods[condition] = float('inf')
+            # Without spare bandwidth the busy period does not end
+            if not utilization < supply.bandwidth:
+                continue
+            lValue = 1
+            for _ in range(maxIterations):
+                lNext = supply.sbfInv(workload(lValue))
+                if lNext <= lValue:
+                    busyPeriods[condition] = lValue
+                    break
+                lValue = lNext
+        return busyPeriods
+
     def _calcCndnA(self):
         if self.DEBUG:
             self._data_cndnA = list()
 
         if USE_QPA:
-            return self._QPA(self._dbf_CndA, self._sbf_Rn, self._sbf_Rn_Inv, self.lA)
+            return self._QPA(self._dbf_CndA, self.supplyN, self.lA, condition='A')
         else:
             for lValue in range(self.lA):
                 lhs = self._dbf_CndA(lValue)
-                rhs = self._sbf_Rn(lValue)
+                rhs = self.supplyN.sbf(lValue)
                 if self.DEBUG:
                     self._data_cndnA.append((lValue, lhs, rhs))
                 if lhs > rhs:
@@ -277,11 +655,11 @@ class SchedulabilityTest():
             self._data_cndnB = list()
 
         if USE_QPA:
-            return self._QPA(self._dbf_CndB, self._sbf_Rn, self._sbf_Rn_Inv, self.lB)
+            return self._QPA(self._dbf_CndB, self.supplyN, self.lB, condition='B')
         else:
             for lValue in range(self.lB):
                 lhs = self._dbf_CndB(lValue)
-                rhs = self._sbf_Rn(lValue)
+                rhs = self.supplyN.sbf(lValue)
                 if self.DEBUG:
                     self._data_cndnB.append((lValue, lhs, rhs))
                 if lhs > rhs:
@@ -293,11 +671,11 @@ class SchedulabilityTest():
             self._data_cndnC = list()
 
         if USE_QPA:
-            return self._QPA(self._dbf_CndC, self._sbf_Rc, self._sbf_Rc_Inv, self.lC)
+            return self._QPA(self._dbf_CndC, self.supplyC, self.lC, condition='C')
         else:
             for lValue in range(self.lC):
                 lhs = self._dbf_CndC(lValue)
-                rhs = self._sbf_Rc(lValue)
+                rhs = self.supplyC.sbf(lValue)
                 if self.DEBUG:
                     self._data_cndnC.append((lValue, lhs, rhs))
                 if lhs > rhs:
@@ -309,11 +687,11 @@ class SchedulabilityTest():
             self._data_cndnD = list()
 
         if USE_QPA:
-            return self._QPA(self._dbf_CndD, self._sbf_Rc, self._sbf_Rc_Inv, self.lD)
+            return self._QPA(self._dbf_CndD, self.supplyC, self.lD, condition='D')
         else:
             for lValue in range(self.lD):
                 lhs = self._dbf_CndD(lValue)
-                rhs = self._sbf_Rc(lValue)
+                rhs = self.supplyC.sbf(lValue)
                 if self.DEBUG:
                     self._data_cndnD.append((lValue, lhs, rhs))
                 if lhs > rhs:
@@ -323,118 +701,83 @@ class SchedulabilityTest():
     def _dbf_LO_SM1(self, task, lValue):
         return max(0, floor((lValue-task.deadline)/(task.period))+1)*task.wcetLO
 
-    def _dbf_HI_SM1(self, task, lValue):
-        return max(0, floor((lValue-task.deadlineV)/(task.period))+1)*task.wcetLO
+    def _dbf_HI_SM1(self, task, deadlineV, lValue):
+        return max(0, floor((lValue-deadlineV)/(task.period))+1)*task.wcetLO
 
     def _dbf_LO_SM2w(self, task, lValue):
         return max(0, ceil(task.r * (floor((lValue-task.deadline)/(task.period))+1)))*task.wcetLO
 
-    def _dbf_HI_SM2w(self, task, lValue):
-        return self._full(task,lValue) - self._done(task,lValue)
+    def _dbf_HI_SM2w(self, task, deadlineV, lValue):
+        return self._full(task,deadlineV,lValue) - self._done(task,deadlineV,lValue)
 
     def _dbf_LO_SM2r(self, task, lValue):
         return max(0, ceil(task.r * (floor((lValue-task.deadline)/(task.period))+1)))*task.wcetLO
 
-    def _dbf_HI_SM2r(self, task, lValue):
-        return max(0, floor((lValue-task.deadlineV)/(task.period))+1)*task.wcetLO
+    def _dbf_HI_SM2r(self, task, deadlineV, lValue):
+        return max(0, floor((lValue-deadlineV)/(task.period))+1)*task.wcetLO
 
-    def _dbf_HI_SM3(self, task, lValue):
-        return self._dbf_HI_SM2w(task, lValue)
+    def _dbf_HI_SM3(self, task, deadlineV, lValue):
+        return self._dbf_HI_SM2w(task, deadlineV, lValue)
 
-    def _full(self, task, lValue):
-        return max(0, floor((lValue-(task.deadline - task.deadlineV))/(task.period))+1)*task.wcetHI
+    def _full(self, task, deadlineV, lValue):
+        return max(0, floor((lValue-(task.deadline - deadlineV))/(task.period))+1)*task.wcetHI
 
-    def _done(self, task, lValue):
+    def _done(self, task, deadlineV, lValue):
         n = mod(lValue, task.period)
-        if ((task.deadline - task.deadlineV) <= n) and (n <= task.deadline):
-            return max(0, task.wcetLO - n + task.deadline - task.deadlineV)
+        if ((task.deadline - deadlineV) <= n) and (n <= task.deadline):
+            return max(0, task.wcetLO - n + task.deadline - deadlineV)
         else:
             return 0
     
     def _dbf_CndA(self, lValue):
         lhs = 0
-        lhs += sum(self._dbf_LO_SM1(task, lValue) for task in self.taskSet.values() if task.criticality=='LO')
-        lhs += sum(self._dbf_HI_SM1(task, lValue) for task in self.taskSet.values() if task.criticality=='HI')
+        lhs += sum(self._dbf_LO_SM1(task, lValue) for task in self.tasksLO)
+        lhs += sum(self._dbf_HI_SM1(task, deadlineV, lValue) for task, deadlineV in zip(self.tasksHI, self.deadlinesV))
         return lhs
     
     def _dbf_CndB(self, lValue):
         lhs = 0
-        lhs += sum(self._dbf_LO_SM2w(task, lValue) for task in self.taskSet.values() if task.criticality=='LO')
-        lhs += sum(self._dbf_HI_SM2w(task, lValue) for task in self.taskSet.values() if task.criticality=='HI')
+        lhs += sum(self._dbf_LO_SM2w(task, lValue) for task in self.tasksLO)
+        lhs += sum(self._dbf_HI_SM2w(task, deadlineV, lValue) for task, deadlineV in zip(self.tasksHI, self.deadlinesV))
         return lhs
     
     def _dbf_CndC(self, lValue):
         lhs = 0
-        lhs += sum(self._dbf_LO_SM2r(task, lValue) for task in self.taskSet.values() if task.criticality=='LO')
-        lhs += sum(self._dbf_HI_SM2r(task, lValue) for task in self.taskSet.values() if task.criticality=='HI')
+        lhs += sum(self._dbf_LO_SM2r(task, lValue) for task in self.tasksLO)
+        lhs += sum(self._dbf_HI_SM2r(task, deadlineV, lValue) for task, deadlineV in zip(self.tasksHI, self.deadlinesV))
         return lhs
     
     def _dbf_CndD(self, lValue):
-        lhs = sum(self._dbf_HI_SM3(task, lValue) for task in self.taskSet.values() if task.criticality=='HI')
+        lhs = sum(self._dbf_HI_SM3(task, deadlineV, lValue) for task, deadlineV in zip(self.tasksHI, self.deadlinesV))
         return lhs
                 
 
-    def _sbf_Rn(self, delta):
-        epsilon = max(0, delta-2*(self.pi - self.thetaN)-self.pi*floor((delta - (self.pi - self.thetaN))/self.pi))
-        if delta <= (2*(self.pi - self.thetaN)):
-            return 0
-        else:
-            return floor((delta - (self.pi - self.thetaN))/self.pi)*self.thetaN + epsilon
-
-    def _sbf_Rc(self, delta):
-        epsilon = max(0, delta-2*(self.pi - self.thetaC)-self.pi*floor((delta - (self.pi - self.thetaC))/self.pi))
-        if delta <= (2*(self.pi - self.thetaC)):
-            return 0
-        else:
-            return floor((delta - (self.pi - self.thetaC))/self.pi)*self.thetaC + epsilon
-
-    def _Old_sbf_Rn_Inv(self, supply):
-        if supply == 0:
-            return 2*(self.pi - self.thetaN)
-        else:
-            if (supply - self.thetaN*floor(supply/self.thetaN)) > 0:
-                epsilon = self.pi - self.thetaN + supply - self.thetaN*floor(supply/self.thetaN)
-            else:
-                epsilon = 0
-            return (self.pi - self.thetaN) + self.pi * floor(supply/self.thetaN) + epsilon
+    def _setScaling(self, x):
+        self.deadlinesV = [x*task.deadline for task in self.tasksHI]
+        if self.demand is not None:
+            self.demand.setScaling(x)
 
-    def _Old_sbf_Rc_Inv(self, supply):
-        if supply == 0:
-            return 2*(self.pi - self.thetaC)
-        else:
-            if (supply - self.thetaC*floor(supply/self.thetaC)) > 0:
-                epsilon = self.pi - self.thetaC + supply - self.thetaC*floor(supply/self.thetaC)
-            else:
-                epsilon = 0
-            return (self.pi - self.thetaC) + self.pi * floor(supply/self.thetaC) + epsilon
-    
-    def _sbf_Rn_Inv(self, supply):
-        if (supply-self.thetaN*floor(supply/self.thetaN)) > 0:
-            epsilonT = self.pi - self.thetaN + supply - self.thetaN*floor(supply/self.thetaN)
-        else:
-            epsilonT = 0
-        return (self.pi - self.thetaN) + self.pi*floor(supply/self.thetaN) + epsilonT
-
-    def _sbf_Rc_Inv(self, supply):
-        if (supply-self.thetaC*floor(supply/self.thetaC)) > 0:
-            epsilonT = self.pi - self.thetaC + supply - self.thetaC*floor(supply/self.thetaC)
-        else:
-            epsilonT = 0
-        return (self.pi - self.thetaC) + self.pi*floor(supply/self.thetaC) + epsilonT
-    
     def _calcDeadlineV(self, epsilon = 1E-2):
         delta = 0.5
         x = delta
         while delta >= epsilon:
             delta /= 2
-            for task in self.taskSet.values():
-                if task.criticality == 'HI':
-                    task.deadlineV = x*task.deadline
-            self._calcL()
-            cndnA = self._calcCndnA()
-            cndnB = self._calcCndnB()
-            cndnC = self._calcCndnC()
-            cndnD = self._calcCndnD()
+            self.bisectionSteps += 1
+            self._setScaling(x)
+            if self.stats is not None:
+                startTime = time.perf_counter()
+                self._calcL()
+                self.stats.phaseTimes['calcL'] += time.perf_counter() - startTime
+                self.stats.addHorizons({'A': self.lA, 'B': self.lB, 'C': self.lC, 'D': self.lD})
+            else:
+                self._calcL()
+            if self.incrementalBisection:
+                cndnA, cndnB, cndnC, cndnD = self._calcCndnsIncremental(x)
+            else:
+                cndnA = self._calcCndnA()
+                cndnB = self._calcCndnB()
+                cndnC = self._calcCndnC()
+                cndnD = self._calcCndnD()
 
             if cndnA and cndnB and cndnC and cndnD:
                 return x
@@ -482,17 +825,122 @@ class SchedulabilityTest():
         else:
             raise EpsilonException('Failed to find x: Try with a smaller epsilon')
     
-    def _QPA(self, dbf, sbf, sbfInv, lValue, precisionLimit = 1E-6):
-        deadlines = set()
-        for task in self.taskSet.values():
-            t = 0
-            while (t + task.deadline) < lValue:
-                deadlines.add(t + task.deadline)
-                t += task.period
-
-        minDeadline = min([task.deadline for task in self.taskSet.values()])
+    def _deadlineIndex(self, lValue):
+        # Sorted absolute deadlines below lValue. The index is grown
+        # geometrically when a larger lValue is requested and truncated
+        # otherwise.
+        if lValue > self._deadlineHorizon:
+            horizon = max(lValue, 2*self._deadlineHorizon)
+            self._deadlines = numpy.unique(numpy.concatenate(
+                [numpy.arange(deadline, horizon, period, dtype=numpy.int64)
+                 for deadline, period in zip(self.taskSet.deadline.tolist(), self.taskSet.period.tolist())]))
+            self._deadlineHorizon = horizon
+        return self._deadlines[:numpy.searchsorted(self._deadlines, lValue)]
+
+    def _calcCndnsIncremental(self, x):
+        # A and C only get easier as x grows, B and D as x shrinks. Each
+        # condition keeps the x range where its outcome is already known.
+        # Conditions that cannot change the decision of _calcDeadlineV are
+        # skipped and reported as False, which selects the same branch.
+        cndnA = self._calcCndnCached('A', x)
+        if cndnA:
+            cndnC = self._calcCndnCached('C', x)
+            cndnB = self._calcCndnCached('B', x)
+            if cndnC and not cndnB:
+                cndnD = self._skipCndn()
+            elif not cndnC and not cndnB:
+                cndnD = self._skipCndn()
+            else:
+                cndnD = self._calcCndnCached('D', x)
+        else:
+            cndnB = self._calcCndnCached('B', x)
+            cndnD = self._calcCndnCached('D', x) if cndnB else self._skipCndn()
+            cndnC = self._skipCndn()
+        return cndnA, cndnB, cndnC, cndnD
+
+    def _skipCndn(self):
+        self.skippedConditions += 1
+        return False
+
+    def _calcCndnCached(self, condition, x):
+        bounds = self._cndnBounds[condition]
+        if condition in 'AC':
+            if x >= bounds['true']:
+                self.skippedConditions += 1
+                return True
+            if x <= bounds['false']:
+                self.skippedConditions += 1
+                return False
+        else:
+            if x <= bounds['true']:
+                self.skippedConditions += 1
+                return True
+            if x >= bounds['false']:
+                self.skippedConditions += 1
+                return False
+
+        value = getattr(self, '_calcCndn' + condition)()
+        if condition in 'AC':
+            if value:
+                bounds['true'] = min(bounds['true'], x)
+            else:
+                bounds['false'] = max(bounds['false'], x)
+        else:
+            if value:
+                bounds['true'] = max(bounds['true'], x)
+            else:
+                bounds['false'] = min(bounds['false'], x)
+        return value
+
+    def _checkpoints(self, condition, lValue):
+        # Points below lValue where dbf - sbf of condition may peak, and the
+        # first point with demand. Besides the deadlines D + kT these are the
+        # HI steps at x*D + kT (A, C) and, for B and D, the steps at
+        # D - x*D + kT and the ends D - x*D + wcetLO + kT of the ramps of the
+        # carry-over term. A horizon can end before the first real deadline,
+        # and the QPA may only stop at sbf(first point) if no demand lies
+        # before it.
+        deadlines = self._deadlineIndex(lValue)
+        if condition is None or not self.tasksHI:
+            return deadlines, self._minDeadline
+        steps = [deadlines]
+        firstStep = self._minDeadline
+        for task, offset in self._stepOffsets(condition):
+            # offset + k*T as in BatchSchedulabilityTest._prevStep
+            k = numpy.arange(max(0, int(ceil((lValue - offset)/task.period))) + 1)
+            step = offset + k*task.period
+            steps.append(step[step < lValue])
+            firstStep = min(firstStep, offset)
+        return numpy.unique(numpy.concatenate(steps)), firstStep
+
+    def _stepOffsets(self, condition):
+        if condition in 'AC':
+            return [(task, deadlineV) for task, deadlineV in zip(self.tasksHI, self.deadlinesV)]
+        return [(task, task.deadline - deadlineV + shift) for task, deadlineV in zip(self.tasksHI, self.deadlinesV)
+            for shift in (0, min(task.wcetLO, deadlineV))]
+
+    def _QPA(self, dbf, supply, lValue, precisionLimit = 1E-6, condition=None):
+        deadlines, minDeadline = self._checkpoints(condition, lValue)
+        if self.stats is None or condition is None:
+            return self._QPALoop(dbf, supply, deadlines, minDeadline, condition)[0]
+        startTime = time.perf_counter()
+        dbfEvaluations = self.dbfEvaluations
+        result, inverseSteps = self._QPALoop(dbf, supply, deadlines, minDeadline, condition)
+        self.stats.addQPA(condition, self.dbfEvaluations - dbfEvaluations, inverseSteps, len(deadlines),
+                time.perf_counter() - startTime)
+        return result
+
+    def _QPALoop(self, dbf, supply, deadlines, minDeadline, condition):
+        # Returns the outcome and the number of steps through sbfInv
+        if self.dbfEngine == 'jit' and condition is not None and isinstance(supply, PeriodicResource):
+            return self._QPAKernel(condition, supply, deadlines, minDeadline)
+        sbf, sbfInv = supply.sbf, supply.sbfInv
+        inverseSteps = 0
+
         sbf_minDeadline = sbf(minDeadline)
-        t = max(deadlines, default=0)
+        # item() keeps integer deadlines ints
+        t = deadlines[-1].item() if len(deadlines) else 0
+        self.dbfEvaluations += 1
         dbf_t = int64(dbf(t))
         sbf_t = int64(sbf(t))
         # while (precisionLimit <= (sbf_t - dbf_t)) and (dbf_t > sbf_minDeadline):
@@ -500,19 +948,37 @@ class SchedulabilityTest():
             # if precisionLimit < abs(sbf_t - dbf_t):
             if 0 < (sbf_t - dbf_t):
                 t = sbfInv(dbf_t)
+                inverseSteps += 1
             else:
-                t = max([d for d in deadlines if d<t])
+                # Largest deadline strictly before t
+                index = numpy.searchsorted(deadlines, t)
+                if index == 0:
+                    raise ValueError('No deadline before t = {}'.format(t))
+                t = deadlines[index-1].item()
+            self.dbfEvaluations += 1
             dbf_t = int64(dbf(t))
             sbf_t = int64(sbf(t))
-            if t > 1E10:
-                print('Bad!')
         
         if dbf_t <= sbf_minDeadline:
-            return True
+            return True, inverseSteps
         else:
-            return False
+            return False, inverseSteps
     
+    def _QPAKernel(self, condition, supply, deadlines, minDeadline):
+        demand = self.demand
+        result, evaluations, inverseSteps = self._kernels.qpaKernel(self._kernels.conditionIds[condition], deadlines,
+                minDeadline, float(supply.pi), float(supply.theta),
+                demand.loWcetLO.ravel(), demand.loPeriod.ravel(), demand.loDeadline.ravel(), demand.loR.ravel(),
+                demand.hiWcetLO.ravel(), demand.hiWcetHI.ravel(), demand.hiPeriod.ravel(),
+                demand.hiDeadline.ravel(), demand.hiDeadlineV.ravel())
+        self.dbfEvaluations += evaluations
+        if result < 0:
+            raise ValueError('No deadline before t in condition {}'.format(condition))
+        return result == 1, inverseSteps
+
     def _plot_cndnX(self, plotData, plotTitle):
+        # Imported here so that workers never load matplotlib
+        from matplotlib import pyplot as plt
         lData = list()
         lhsData = list()
         rhsData = list()
@@ -526,3 +992,227 @@ class SchedulabilityTest():
         ax.legend(['lhs', 'rhs'])
         plt.title(plotTitle)
         plt.show()
+
+
+class BatchSchedulabilityTest():
+    # Runs the bisection of SchedulabilityTest._calcDeadlineV for many task
+    # sets in lock-step. The task sets are packed into (numOfTaskSets x
+    # maxTasks) arrays padded with masked-out columns; every step evaluates
+    # _calcL, the four QPA conditions and the bisection decision for all
+    # task sets that are still searching. Each formula follows the scalar
+    # code operation by operation, so the scaling factors are identical.
+    def __init__(self, taskSets, thetaN, thetaC, resourcePeriod, epsilon=1E-6, qpaPrefilter=True):
+        numOfTaskSets = len(taskSets)
+        maxTasks = max([len(taskSet) for taskSet in taskSets], default=0)
+        shape = (numOfTaskSets, maxTasks)
+        self.wcetLO = numpy.zeros(shape)
+        self.wcetHI = numpy.zeros(shape)
+        self.period = numpy.ones(shape)
+        self.deadline = numpy.zeros(shape)
+        self.r = numpy.ones(shape)
+        self.isLO = numpy.zeros(shape, dtype=bool)
+        self.isHI = numpy.zeros(shape, dtype=bool)
+        for i, taskSet in enumerate(taskSets):
+            # Columns in storage order (LO tasks first), which keeps the
+            # order within each criticality and thus the per-mask sums
+            n = len(taskSet)
+            self.wcetLO[i, :n] = taskSet.wcetLO
+            self.wcetHI[i, :n] = taskSet.wcetHI
+            self.period[i, :n] = taskSet.period
+            self.deadline[i, :n] = taskSet.deadline
+            self.r[i, :n] = taskSet.r
+            self.isLO[i, :n] = ~taskSet.isHI
+            self.isHI[i, :n] = taskSet.isHI
+        self.isTask = self.isLO | self.isHI
+        self.deadlineV = self.deadline.copy()
+
+        self.c1 = numpy.array([taskSet.totalUtilization_LO_LO for taskSet in taskSets], dtype=numpy.float64)
+        self.c2 = numpy.array([taskSet.totalUtilization_LO_HI for taskSet in taskSets], dtype=numpy.float64)
+        self.c3 = self._sumColumns(self.r*self.wcetLO/self.period, self.isLO)
+        self.c4 = numpy.array([taskSet.totalUtilization_HI_HI for taskSet in taskSets], dtype=numpy.float64)
+
+        self.pi = numpy.broadcast_to(numpy.asarray(resourcePeriod, dtype=numpy.float64), (numOfTaskSets,)).copy()
+        self.thetaN = numpy.broadcast_to(numpy.asarray(thetaN, dtype=numpy.float64), (numOfTaskSets,)).copy()
+        self.thetaC = numpy.broadcast_to(numpy.asarray(thetaC, dtype=numpy.float64), (numOfTaskSets,)).copy()
+        self.wN = self.thetaN/self.pi
+        self.wC = self.thetaC/self.pi
+        self.epsilon = epsilon
+        self.minDeadline = numpy.where(self.isTask, self.deadline, numpy.inf).min(axis=1, initial=numpy.inf)
+        # Same pre-filter as SchedulabilityTest
+        self.loFeasible = numpy.array([not qpaPrefilter or QPA(taskSet, 'LO').solve() for taskSet in taskSets], dtype=bool)
+
+    def solve(self):
+        numOfTaskSets = len(self.pi)
+        self.scalingFactors = numpy.full(numOfTaskSets, numpy.nan)
+
+        # The utilization checks of _calcL do not depend on x (condition C
+        # is checked against wN there too)
+        feasible = (self.c1 + self.c2 < self.wN) & (self.c3 + self.c4 < self.wN) & (self.c2 + self.c3 < self.wN) & (self.c3 < self.wC)
+        feasible &= self.loFeasible
+        self.scalingFactors[~feasible] = -1
+        active = feasible.copy()
+
+        delta = 0.5
+        x = numpy.full(numOfTaskSets, delta)
+        while delta >= self.epsilon:
+            delta /= 2
+            idx = numpy.flatnonzero(active)
+            if len(idx) == 0:
+                break
+            self.deadlineV[idx] = x[idx, None]*self.deadline[idx]
+            lA, lB, lC, lD = self._calcL(idx)
+            cndnA = self._QPA(self._dbf_CndA, self.thetaN, lA, idx, 'A')
+            cndnB = self._QPA(self._dbf_CndB, self.thetaN, lB, idx, 'B')
+            cndnC = self._QPA(self._dbf_CndC, self.thetaC, lC, idx, 'C')
+            cndnD = self._QPA(self._dbf_CndD, self.thetaC, lD, idx, 'D')
+
+            success = cndnA & cndnB & cndnC & cndnD
+            decrease = cndnA & cndnC & ~(cndnB & cndnD)
+            increase = cndnB & cndnD & ~(cndnA & cndnC)
+            failure = ~(success | decrease | increase)
+
+            self.scalingFactors[idx[success]] = x[idx[success]]
+            self.scalingFactors[idx[failure]] = -1
+            active[idx[success | failure]] = False
+            x[idx[decrease]] -= delta
+            x[idx[increase]] += delta
+
+        self.scalingFactors[active] = -3
+        return self.scalingFactors
+
+    def _sumColumns(self, terms, mask):
+        # Sequential accumulation in task order, as sum() does per task set
+        lhs = numpy.zeros(terms.shape[0])
+        for j in range(terms.shape[1]):
+            lhs = lhs + numpy.where(mask[:, j], terms[:, j], 0)
+        return lhs
+
+    def _maxColumns(self, terms, mask):
+        # max([...], default=0) per task set
+        value = numpy.where(mask, terms, -numpy.inf).max(axis=1, initial=-numpy.inf)
+        return numpy.where(mask.any(axis=1), value, 0)
+
+    def _calcL(self, idx):
+        c1, c2, c3, c4 = self.c1[idx], self.c2[idx], self.c3[idx], self.c4[idx]
+        period, deadline, deadlineV, r = self.period[idx], self.deadline[idx], self.deadlineV[idx], self.r[idx]
+        isLO, isHI = self.isLO[idx], self.isHI[idx]
+        wN, wC, pi, thetaN, thetaC = self.wN[idx], self.wC[idx], self.pi[idx], self.thetaN[idx], self.thetaC[idx]
+
+        maxLO = self._maxColumns(period - deadline, isLO)
+        maxLOr = self._maxColumns(period - deadline + period/r, isLO)
+        maxHIv = self._maxColumns(period - deadlineV, isHI)
+        maxHIc = self._maxColumns(period - (deadline - deadlineV), isHI)
+
+        num = 0 + c1*maxLO
+        num = num + c2*maxHIv
+        num = num + 2*wN*(pi - thetaN)
+        lA = numpy.ceil(num/(wN - c1 - c2)).astype(numpy.int64)
+
+        num = 0 + c3*maxLOr
+        num = num + c4*maxHIc
+        num = num + 2*wN*(pi - thetaN)
+        lB = numpy.ceil(num/(wN - c3 - c4)).astype(numpy.int64)
+
+        num = 0 + c2*maxHIv
+        num = num + c3*maxLOr
+        num = num + 2*wC*(pi - thetaC)
+        lC = numpy.ceil(num/(wC - c2 - c3)).astype(numpy.int64)
+
+        num = 0 + c3*maxLOr
+        num = num + 2*wC*(pi - thetaC)
+        lD = numpy.ceil(num/(wC - c3)).astype(numpy.int64)
+        return lA, lB, lC, lD
+
+    def _dbf_CndA(self, t, idx):
+        t = t[:, None]
+        lo = numpy.maximum(0, numpy.floor((t - self.deadline[idx])/self.period[idx]) + 1)*self.wcetLO[idx]
+        hi = numpy.maximum(0, numpy.floor((t - self.deadlineV[idx])/self.period[idx]) + 1)*self.wcetLO[idx]
+        return self._sumColumns(lo, self.isLO[idx]) + self._sumColumns(hi, self.isHI[idx])
+
+    def _dbf_CndB(self, t, idx):
+        t = t[:, None]
+        lo = self._dbf_LO_SM2(t, idx)
+        hi = self._dbf_HI_SM2w(t, idx)
+        return self._sumColumns(lo, self.isLO[idx]) + self._sumColumns(hi, self.isHI[idx])
+
+    def _dbf_CndC(self, t, idx):
+        t = t[:, None]
+        lo = self._dbf_LO_SM2(t, idx)
+        hi = numpy.maximum(0, numpy.floor((t - self.deadlineV[idx])/self.period[idx]) + 1)*self.wcetLO[idx]
+        return self._sumColumns(lo, self.isLO[idx]) + self._sumColumns(hi, self.isHI[idx])
+
+    def _dbf_CndD(self, t, idx):
+        t = t[:, None]
+        return self._sumColumns(self._dbf_HI_SM2w(t, idx), self.isHI[idx])
+
+    def _dbf_LO_SM2(self, t, idx):
+        return numpy.maximum(0, numpy.ceil(self.r[idx]*(numpy.floor((t - self.deadline[idx])/self.period[idx]) + 1)))*self.wcetLO[idx]
+
+    def _dbf_HI_SM2w(self, t, idx):
+        period, deadline, deadlineV = self.period[idx], self.deadline[idx], self.deadlineV[idx]
+        full = numpy.maximum(0, numpy.floor((t - (deadline - deadlineV))/period) + 1)*self.wcetHI[idx]
+        n = numpy.fmod(t, period)
+        window = ((deadline - deadlineV) <= n) & (n <= deadline)
+        done = numpy.where(window, numpy.maximum(0, self.wcetLO[idx] - n + deadline - deadlineV), 0)
+        return full - done
+
+    def _sbf(self, delta, theta, idx):
+        return periodicSbf(delta, self.pi[idx], theta)
+
+    def _sbfInv(self, supply, theta, idx):
+        return periodicSbfInv(supply, self.pi[idx], theta)
+
+    def _stepOffsets(self, condition, idx):
+        # Offsets of the HI steps checked besides the deadlines, as in
+        # SchedulabilityTest._checkpoints
+        deadline, deadlineV = self.deadline[idx], self.deadlineV[idx]
+        if condition in 'AC':
+            return [deadlineV]
+        return [deadline - deadlineV, deadline - deadlineV + numpy.minimum(self.wcetLO[idx], deadlineV)]
+
+    def _prevStep(self, bound, offset, period, valid):
+        # Largest offset + k*T below bound per row, -inf if there is none
+        k = numpy.ceil((bound - offset)/period) - 1
+        # Correct the float division by one step either way
+        k = numpy.where(offset + (k + 1)*period < bound, k + 1, k)
+        k = numpy.where(offset + k*period >= bound, k - 1, k)
+        valid = valid & (offset < bound)
+        return numpy.where(valid, offset + k*period, -numpy.inf).max(axis=1, initial=-numpy.inf)
+
+    def _prevDeadline(self, t, lValue, idx, condition):
+        # Largest checkpoint of condition below both t and lValue, i.e.
+        # max([d for d in checkpoints if d<t]) without building the set
+        bound = numpy.minimum(t, lValue)[:, None]
+        period = self.period[idx]
+        candidates = self._prevStep(bound, self.deadline[idx], period, self.isTask[idx])
+        for offset in self._stepOffsets(condition, idx):
+            candidates = numpy.maximum(candidates, self._prevStep(bound, offset, period, self.isHI[idx]))
+        return numpy.where(candidates > -numpy.inf, candidates, 0)
+
+    def _QPA(self, dbf, theta, lValue, idx, condition):
+        theta = theta[idx]
+        minDeadline = self.minDeadline[idx]
+        for offset in self._stepOffsets(condition, idx):
+            minDeadline = numpy.minimum(minDeadline, numpy.where(self.isHI[idx], offset, numpy.inf).min(axis=1, initial=numpy.inf))
+        sbf_minDeadline = self._sbf(minDeadline, theta, idx)
+        t = self._prevDeadline(lValue.astype(numpy.float64), lValue, idx, condition)
+        dbf_t = dbf(t, idx).astype(numpy.int64)
+        sbf_t = self._sbf(t, theta, idx).astype(numpy.int64)
+        active = (0 <= (sbf_t - dbf_t)) & (dbf_t > sbf_minDeadline)
+        while active.any():
+            a = numpy.flatnonzero(active)
+            jump = 0 < (sbf_t[a] - dbf_t[a])
+            t[a] = numpy.where(jump,
+                    self._sbfInv(dbf_t[a], theta[a], idx[a]),
+                    self._prevDeadline(t[a], lValue[a], idx[a], condition))
+            dbf_t[a] = dbf(t[a], idx[a]).astype(numpy.int64)
+            sbf_t[a] = self._sbf(t[a], theta[a], idx[a]).astype(numpy.int64)
+            active[a] = (0 <= (sbf_t[a] - dbf_t[a])) & (dbf_t[a] > sbf_minDeadline[a])
+        return dbf_t <= sbf_minDeadline
+
+
+def analyseBatch(taskSets, thetaN, thetaC, resourcePeriod, epsilon=1E-6, qpaPrefilter=True):
+    # Scaling factors for many task sets, with the same -1/-3 failure codes
+    # as SchedulabilityTest.scalingFactor. Supply parameters may be scalars
+    # or one value per task set.
+    return BatchSchedulabilityTest(taskSets, thetaN, thetaC, resourcePeriod, epsilon, qpaPrefilter).solve()
@@ -5,28 +5,105 @@ Created on Thu Jun  6 18:45:42 2019
 @email: sudharsan.vaidhun@knights.ucf.edu
 """
 
+import numpy
 import numpy.random as random
 from numpy import ceil, average
 
-class TaskSet(dict):
-    def __init__(self) -> None:
-        self.numOfTasks = 0
-        self.totalUtilization_HI_HI = 0
-        self.totalUtilization_HI_LO = 0
-        self.totalUtilization_LO_HI = 0
-        self.totalUtilization_LO_LO = 0
+class TaskSet():
+    # Struct of arrays: one numpy column per task parameter plus the isHI
+    # mask. LO tasks are stored before HI tasks so that e.g.
+    # taskSet.period[taskSet.hi] is a zero-copy view. Iterating like the old
+    # dict of tasks yields read-only Task views in insertion order.
+    def __init__(self, wcetLO=(), wcetHI=(), period=(), deadline=(), isHI=(), r=1, taskIndex=None) -> None:
+        isHI = numpy.asarray(isHI, dtype=bool)
+        numOfTasks = len(isHI)
+        if taskIndex is None:
+            taskIndex = numpy.arange(1, numOfTasks + 1)
+        # Stable, so the order within each criticality is the insertion order
+        storage = numpy.argsort(isHI, kind='stable')
+        self.taskIndex = self._column(taskIndex)[storage]
+        self.wcetLO = self._column(wcetLO)[storage]
+        self.wcetHI = self._column(wcetHI)[storage]
+        self.period = self._column(period)[storage]
+        self.deadline = self._column(deadline)[storage]
+        self.r = numpy.broadcast_to(numpy.asarray(r, dtype=numpy.float64), (numOfTasks,))[storage]
+        self.isHI = isHI[storage]
+        self._insertionOrder = numpy.argsort(storage)
+
+        numOfLO = numOfTasks - int(self.isHI.sum())
+        self.lo = slice(0, numOfLO)
+        self.hi = slice(numOfLO, numOfTasks)
+        self.numOfTasks = numOfTasks
+        self.utilizationLO = self.wcetLO/self.period
+        self.utilizationHI = self.wcetHI/self.period
+        # Summed one task at a time like the old addTask accumulation
+        self.totalUtilization_LO_LO = sum(self.utilizationLO[self.lo].tolist())
+        self.totalUtilization_HI_LO = sum(self.utilizationHI[self.lo].tolist())
+        self.totalUtilization_LO_HI = sum(self.utilizationLO[self.hi].tolist())
+        self.totalUtilization_HI_HI = sum(self.utilizationHI[self.hi].tolist())
+        self._tasks = None
+
+    @staticmethod
+    def _column(values):
+        column = numpy.asarray(values)
+        if column.size == 0:
+            return numpy.zeros(0, dtype=numpy.int64)
+        return column
+
+    @classmethod
+    def fromTasks(cls, tasks) -> 'TaskSet':
+        return cls(
+            wcetLO = [task.wcetLO for task in tasks],
+            wcetHI = [task.wcetHI for task in tasks],
+            period = [task.period for task in tasks],
+            deadline = [task.deadline for task in tasks],
+            isHI = [task.criticality == 'HI' for task in tasks],
+            r = [task.r for task in tasks],
+            taskIndex = [task.taskIndex for task in tasks])
 
     def addTask(self, task) -> None:
-        self[task.taskIndex] = task
-        self.numOfTasks = len(self)
-        if task.criticality == 'LO':
-            self.totalUtilization_LO_LO += task.utilizationLO
-            self.totalUtilization_HI_LO += task.utilizationHI
-        elif task.criticality == 'HI':
-            self.totalUtilization_LO_HI += task.utilizationLO
-            self.totalUtilization_HI_HI += task.utilizationHI
+        # Rebuilds the columns; build whole sets with fromTasks instead
+        tasks = list(self.values())
+        indices = [other.taskIndex for other in tasks]
+        if task.taskIndex in indices:
+            tasks[indices.index(task.taskIndex)] = task
         else:
+            tasks.append(task)
+        if task.criticality not in ('LO', 'HI'):
             raise Exception('Error!')
+        self.__dict__.update(TaskSet.fromTasks(tasks).__dict__)
+
+    def _views(self) -> dict:
+        if self._tasks is None:
+            columns = [self.taskIndex.tolist(), self.wcetLO.tolist(), self.wcetHI.tolist(), self.period.tolist(),
+                       self.deadline.tolist(), ['HI' if isHI else 'LO' for isHI in self.isHI.tolist()], self.r.tolist()]
+            views = [Task._view(*values) for values in zip(*columns)]
+            self._tasks = {views[i].taskIndex: views[i] for i in self._insertionOrder.tolist()}
+        return self._tasks
+
+    def __getstate__(self):
+        return dict(self.__dict__, _tasks=None)
+
+    def __len__(self):
+        return self.numOfTasks
+
+    def __iter__(self):
+        return iter(self._views())
+
+    def __contains__(self, taskIndex):
+        return taskIndex in self._views()
+
+    def __getitem__(self, taskIndex):
+        return self._views()[taskIndex]
+
+    def keys(self):
+        return self._views().keys()
+
+    def values(self):
+        return self._views().values()
+
+    def items(self):
+        return self._views().items()
     
     def listTasks(self) -> None:
         print("| Index | WCET (LO) | WCET (HI) | Period | Deadline | Util. (LO) | Util. (HI) |  X |")
@@ -41,21 +118,46 @@ class TaskSet(dict):
 
 
 class Task():
+    # Read-only record of one task. TaskSet hands out Task views of its
+    # columns; the analysis passes the virtual deadline around instead of
+    # storing it on the task.
+    __slots__ = ('taskIndex', 'wcetLO', 'wcetHI', 'period', 'deadline', 'criticality', 'utilizationLO', 'utilizationHI', 'r')
     counter = 0
     def __init__(self, wcetLO, wcetHI, period, deadline, criticality, rate=1) -> None:
         Task.counter += 1
-        self.taskIndex = Task.counter
-        self.wcetLO = wcetLO
-        self.wcetHI = wcetHI
-        self.deadline = deadline
-        self.period = period
-        self.criticality = criticality
-        self.utilizationLO = self.wcetLO / self.period
-        self.utilizationHI = self.wcetHI / self.period
-        self.r = rate
+        self._set(Task.counter, wcetLO, wcetHI, period, deadline, criticality, rate)
+
+    @classmethod
+    def _view(cls, taskIndex, wcetLO, wcetHI, period, deadline, criticality, rate) -> 'Task':
+        task = object.__new__(cls)
+        task._set(taskIndex, wcetLO, wcetHI, period, deadline, criticality, rate)
+        return task
+
+    def _set(self, taskIndex, wcetLO, wcetHI, period, deadline, criticality, rate) -> None:
+        setValue = object.__setattr__
+        setValue(self, 'taskIndex', taskIndex)
+        setValue(self, 'wcetLO', wcetLO)
+        setValue(self, 'wcetHI', wcetHI)
+        setValue(self, 'deadline', deadline)
+        setValue(self, 'period', period)
+        setValue(self, 'criticality', criticality)
+        setValue(self, 'utilizationLO', wcetLO / period)
+        setValue(self, 'utilizationHI', wcetHI / period)
+        setValue(self, 'r', rate)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Task attributes are read-only')
+
+    def __reduce__(self):
+        return (Task._view, (self.taskIndex, self.wcetLO, self.wcetHI, self.period, self.deadline, self.criticality, self.r))
 
 
 class TaskGen:
+    def __init__(self, rng=None) -> None:
+        # numpy.random.Generator for every draw; pass one derived from a
+        # seed to make the generated task sets reproducible
+        self.rng = rng if rng is not None else random.default_rng()
+
     def genTask(self, method='Iterative', **kwargs) -> TaskSet:
 
         if method=='Uunifast':
@@ -88,19 +190,169 @@ class TaskGen:
             Task.counter = 0
             return self._genTaskIterative(numOfTasks, totalUtilization, critProb, wcetRatio, deadlineRatio, rate)
 
+        if method=='IterativeBatch':
+            return self.genTaskBatch('Iterative', 1, **kwargs)[0]
+
+    def genTaskBatch(self, method='Iterative', count=1, asArrays=False, **kwargs):
+        # Generates count task sets at once. Returns a list of TaskSets, or
+        # with asArrays the padded (count x maxTasks) columns built by the
+        # _genTask*Batch methods.
+        try:
+            numOfTasks = kwargs['numOfTasks']
+            totalUtilization = kwargs['totalUtilization']
+            critProb = kwargs['critProb']
+            wcetRatio = kwargs['wcetRatio']
+            deadlineRatio = kwargs['deadlineRatio']
+            rate = kwargs['rate']
+        except KeyError:
+            print("Missing parameters for '{}' batch method.".format(method))
+            exit()
+
+        if method=='Iterative':
+            taskSetArrays = self._genTaskIterativeBatch(count, numOfTasks, totalUtilization, critProb, wcetRatio, deadlineRatio,
+                    kwargs.get('maxTaskUtil'))
+        elif method=='Uunifast':
+            taskSetArrays = self._genTaskUunifastBatch(count, numOfTasks, totalUtilization, critProb, wcetRatio, deadlineRatio,
+                    kwargs.get('periodDistribution', 'uniform'), kwargs.get('periodRange', (100, 1000)), kwargs.get('maxTaskUtil', 1))
+        else:
+            raise ValueError('Unknown batch method: ' + str(method))
+
+        if asArrays:
+            return taskSetArrays
+        return self._taskSetsFromArrays(taskSetArrays, rate)
+
+    def _taskSetsFromArrays(self, taskSetArrays, rate) -> list:
+        # Valid tasks are a prefix of every row
+        taskSets = list()
+        for i, numOfTasks in enumerate(taskSetArrays['numOfTasks'].tolist()):
+            taskSets.append(TaskSet(
+                wcetLO = taskSetArrays['wcetLO'][i, :numOfTasks],
+                wcetHI = taskSetArrays['wcetHI'][i, :numOfTasks],
+                period = taskSetArrays['period'][i, :numOfTasks],
+                deadline = taskSetArrays['deadline'][i, :numOfTasks],
+                isHI = taskSetArrays['isHI'][i, :numOfTasks],
+                r = rate))
+        return taskSets
+
+    def _getPeriodsBatch(self, shape, periodDistribution='uniform', periodRange=(100, 1000)):
+        low, high = periodRange
+        if periodDistribution == 'uniform':
+            return self.rng.integers(low, high, size=shape)
+        if periodDistribution == 'loguniform':
+            # Equally many periods per decade, as usual for automotive sets
+            periods = numpy.exp(self.rng.uniform(numpy.log(low), numpy.log(high), size=shape)).astype(numpy.int64)
+            return numpy.clip(periods, low, high - 1)
+        raise ValueError('Unknown period distribution: ' + str(periodDistribution))
+
+    def _taskColumns(self, utilLo, utilHi, isHI, valid, deadlineRatio) -> dict:
+        # Periods, WCETs and deadlines for padded utilization columns, with
+        # the same rounding as the per-task generators
+        period = self._getPeriodsBatch(utilHi.shape)
+        return {
+            'utilizationLO': numpy.where(valid, utilLo, 0),
+            'utilizationHI': numpy.where(valid, utilHi, 0),
+            'period': numpy.where(valid, period, 0),
+            'wcetLO': numpy.where(valid, ceil(utilLo*period), 0).astype(numpy.int64),
+            'wcetHI': numpy.where(valid, ceil(utilHi*period), 0).astype(numpy.int64),
+            'deadline': numpy.where(valid, (deadlineRatio*period).astype(numpy.int64), 0),
+            'isHI': isHI & valid,
+            'valid': valid,
+            'numOfTasks': valid.sum(axis=1),
+            }
+
+    def _genTaskIterativeBatch(self, count, numOfTasks, totalUtilization, critProb, wcetRatio, deadlineRatio, maxTaskUtil=None) -> dict:
+        if maxTaskUtil is None:
+            # 0.8 as in _getUtilizationsIterative; larger sets need smaller
+            # tasks or the target is nearly always overshot. Above 5 tasks the
+            # per-task utilizations are therefore not distributed as in
+            # genTask('Iterative'); pass maxTaskUtil=0.8 for the original cap.
+            maxTaskUtil = 0.8 if numOfTasks <= 5 else min(0.8, 2*totalUtilization/numOfTasks)
+        taskSetData = self._getUtilizationsIterativeBatch(
+            count = count,
+            targetAvgUtilization = totalUtilization,
+            wcetRatio = wcetRatio,
+            minTasks = numOfTasks,
+            probHi = critProb,
+            buffer = 0.025,
+            maxTaskUtil = maxTaskUtil)
+        return self._taskColumns(taskSetData['utilLo'], taskSetData['utilHi'], taskSetData['crit'], taskSetData['valid'], deadlineRatio)
+
+    def _getUtilizationsIterativeBatch(self, count, targetAvgUtilization, wcetRatio, minTasks=5, probHi=0.5, buffer=0.05, maxTaskUtil=0.8):
+        # Same acceptance rule as _getUtilizationsIterative: tasks are added
+        # until the average of the LO and HI utilizations reaches
+        # target - buffer, and the set is kept if it then lies within
+        # target + buffer and has at least minTasks tasks. Candidate
+        # sequences are drawn as blocks and the stopping point of every
+        # row is found from the cumulative sums.
+        lowerBound = targetAvgUtilization - buffer
+        upperBound = targetAvgUtilization + buffer
+        meanStep = 0.5*maxTaskUtil*(1 + probHi + (1 - probHi)*wcetRatio)/2
+        blockLength = int(ceil(1.5*upperBound/meanStep)) + 2
+        acceptanceRate = 0.1
+
+        accepted = list()
+        numOfAccepted = 0
+        numOfCandidates = 0
+        while numOfAccepted < count:
+            numOfRows = int(min(100000, max(16, ceil(1.2*(count - numOfAccepted)/acceptanceRate))))
+            utilHi = numpy.empty((numOfRows, 0))
+            crit = numpy.empty((numOfRows, 0), dtype=bool)
+            utilAvg = numpy.empty((numOfRows, 0))
+            pending = numpy.ones(numOfRows, dtype=bool)
+            # Extend only the rows that have not reached the lower bound yet;
+            # the others are padded with zero utilization past their stop
+            while pending.any():
+                rows = numpy.flatnonzero(pending)
+                newUtil = numpy.zeros((numOfRows, blockLength))
+                newCrit = numpy.zeros((numOfRows, blockLength), dtype=bool)
+                newUtil[rows] = self.rng.random((len(rows), blockLength))*maxTaskUtil
+                newCrit[rows] = self.rng.random((len(rows), blockLength)) > probHi
+                newAvg = numpy.where(newCrit, newUtil*wcetRatio, newUtil)/2 + newUtil/2
+                offset = utilAvg[:, -1:] if utilAvg.shape[1] else 0
+                utilHi = numpy.concatenate([utilHi, newUtil], axis=1)
+                crit = numpy.concatenate([crit, newCrit], axis=1)
+                utilAvg = numpy.concatenate([utilAvg, offset + numpy.cumsum(newAvg, axis=1)], axis=1)
+                pending = ~(utilAvg >= lowerBound).any(axis=1)
+
+            stopIndex = numpy.argmax(utilAvg >= lowerBound, axis=1)
+            stopAvg = utilAvg[numpy.arange(numOfRows), stopIndex]
+            keep = (stopAvg <= upperBound) & (stopIndex + 1 >= minTasks)
+
+            numOfCandidates += numOfRows
+            numOfAccepted += keep.sum()
+            acceptanceRate = max(numOfAccepted, 1)/numOfCandidates
+            maxLength = stopIndex[keep].max(initial=0) + 1
+            valid = numpy.arange(maxLength) <= stopIndex[keep, None]
+            accepted.append((utilHi[keep, :maxLength], crit[keep, :maxLength], valid))
+
+        maxLength = max(block[0].shape[1] for block in accepted)
+        pad = lambda array: numpy.pad(array, ((0, 0), (0, maxLength - array.shape[1])))
+        utilHi = numpy.concatenate([pad(block[0]) for block in accepted])[:count]
+        crit = numpy.concatenate([pad(block[1]) for block in accepted])[:count]
+        valid = numpy.concatenate([pad(block[2]) for block in accepted])[:count]
+        self.acceptanceRate = numOfAccepted/numOfCandidates
+
+        taskSetData = dict()
+        taskSetData['utilLo'] = numpy.where(crit, utilHi*wcetRatio, utilHi)
+        taskSetData['utilHi'] = utilHi
+        taskSetData['crit'] = crit & valid
+        taskSetData['valid'] = valid
+        taskSetData['utilAvg'] = 0.5*(numpy.where(valid, taskSetData['utilLo'], 0).sum(axis=1) + numpy.where(valid, utilHi, 0).sum(axis=1))
+        return taskSetData
+
     
     def _genTaskUunifast(self, numOfTasks, totalUtilization, critProb, wcetRatio, deadlineRatio, rate) -> TaskSet:
-        taskSet = TaskSet()
+        tasks = list()
         utilList = self._getUtilizationsUunifast(numOfTasks, totalUtilization)
         for util in utilList:
-            period = random.randint(100, 1000)
+            period = int(self.rng.integers(100, 1000))
             wcetHI = int(ceil(util*period))
-            criticality = 'HI' if random.rand()>critProb else 'LO'
+            criticality = 'HI' if self.rng.random()>critProb else 'LO'
             if criticality == 'HI':
                 wcetLO = int(ceil(wcetHI/wcetRatio))
             else:
                 wcetLO = wcetHI
-            taskSet.addTask(Task(
+            tasks.append(Task(
                 wcetLO = wcetLO,
                 wcetHI = wcetHI,
                 period = period,
@@ -108,20 +360,67 @@ class TaskGen:
                 criticality = criticality,
                 rate=rate
                 ))
-        return taskSet
+        return TaskSet.fromTasks(tasks)
+
+    def _genTaskUunifastBatch(self, count, numOfTasks, totalUtilization, critProb, wcetRatio, deadlineRatio,
+            periodDistribution='uniform', periodRange=(100, 1000), maxTaskUtil=1) -> dict:
+        util = self._getUtilizationsUunifastBatch(count, numOfTasks, totalUtilization, maxTaskUtil)
+        period = self._getPeriodsBatch(util.shape, periodDistribution, periodRange)
+        isHI = self.rng.random(util.shape) > critProb
+        # Same derivation as _genTaskUunifast: util is the HI utilization
+        wcetHI = ceil(util*period).astype(numpy.int64)
+        wcetLO = numpy.where(isHI, ceil(wcetHI/wcetRatio), wcetHI).astype(numpy.int64)
+        return {
+            'utilizationLO': wcetLO/period,
+            'utilizationHI': wcetHI/period,
+            'period': period,
+            'wcetLO': wcetLO,
+            'wcetHI': wcetHI,
+            'deadline': (deadlineRatio*period).astype(numpy.int64),
+            'isHI': isHI,
+            'valid': numpy.ones(util.shape, dtype=bool),
+            'numOfTasks': numpy.full(count, numOfTasks),
+            }
+
+    def _getUtilizationsUunifastBatch(self, count, numOfTasks, totalUtilization, maxTaskUtil=1):
+        # UUniFast on (count x numOfTasks) arrays. Above a total utilization
+        # of maxTaskUtil some tasks could exceed it, so rows with such a task
+        # are discarded and redrawn (UUniFast-Discard).
+        exponents = 1/numpy.arange(numOfTasks, 1, -1)
+        discard = totalUtilization > maxTaskUtil
+        if discard and totalUtilization > numOfTasks*maxTaskUtil:
+            raise ValueError('Total utilization {} is infeasible for {} tasks of at most {}'.format(
+                totalUtilization, numOfTasks, maxTaskUtil))
+        accepted = list()
+        numOfAccepted = 0
+        numOfCandidates = 0
+        acceptanceRate = 1.0
+        while numOfAccepted < count:
+            numOfRows = int(min(100000, ceil(1.2*(count - numOfAccepted)/acceptanceRate)))
+            sumUtil = totalUtilization*numpy.cumprod(self.rng.random((numOfRows, numOfTasks - 1))**exponents, axis=1)
+            sumUtil = numpy.concatenate([numpy.full((numOfRows, 1), totalUtilization), sumUtil, numpy.zeros((numOfRows, 1))], axis=1)
+            util = sumUtil[:, :-1] - sumUtil[:, 1:]
+            if discard:
+                util = util[(util <= maxTaskUtil).all(axis=1)]
+            numOfCandidates += numOfRows
+            numOfAccepted += len(util)
+            acceptanceRate = max(numOfAccepted, 1)/numOfCandidates
+            accepted.append(util)
+        self.acceptanceRate = numOfAccepted/numOfCandidates
+        return numpy.concatenate(accepted)[:count]
 
     def _getUtilizationsUunifast(self, numOfTasks, totalUtilization) -> list:
         uList = list()
         tempUtil = totalUtilization
         for i in range(numOfTasks-1):
-            nextUtil = tempUtil*random.rand()**(1/(numOfTasks-i))
+            nextUtil = tempUtil*self.rng.random()**(1/(numOfTasks-i))
             uList.append(tempUtil - nextUtil)
             tempUtil = nextUtil
         uList.append(tempUtil)
         return uList
     
     def _genTaskIterative(self, numOfTasks, totalUtilization, critProb, wcetRatio, deadlineRatio, rate):
-        taskSet = TaskSet()
+        tasks = list()
         taskSetData = self._getUtilizationsIterative(
             targetAvgUtilization = totalUtilization,
             wcetRatio = wcetRatio,
@@ -130,14 +429,14 @@ class TaskGen:
             buffer = 0.025)
 
         for utilLo, utilHi, crit in zip(taskSetData['utilLo'], taskSetData['utilHi'], taskSetData['crit']):
-            period = random.randint(100, 1000)
+            period = int(self.rng.integers(100, 1000))
             wcetHI = int(ceil(utilHi*period))
             wcetLO = int(ceil(utilLo*period))
             if crit:
                 criticality = 'HI'
             else:
                 criticality = 'LO'
-            taskSet.addTask(Task(
+            tasks.append(Task(
                 wcetLO = wcetLO,
                 wcetHI = wcetHI,
                 period = period,
@@ -145,7 +444,7 @@ class TaskGen:
                 criticality = criticality,
                 rate=rate
                 ))
-        return taskSet
+        return TaskSet.fromTasks(tasks)
 
     def _getUtilizationsIterative(self, targetAvgUtilization, wcetRatio, minTasks=5, probHi=0.5, buffer=0.05):
         utilLo = list()
@@ -156,9 +455,9 @@ class TaskGen:
         while not done:
             if utilAvg < (targetAvgUtilization - buffer):
                 # Scaling to 80% because otherwise most tasksets will have only one task
-                util = random.rand()*0.8
+                util = self.rng.random()*0.8
                 utilHi.append(util)
-                critValue = random.rand()>probHi
+                critValue = self.rng.random()>probHi
                 if critValue:
                     # HI Task
                     utilLo.append(util*wcetRatio)
@@ -0,0 +1,33 @@
+import sys
+
+import pytest
+
+from main import getRankInfo
+
+launcherVariables = ['OMPI_COMM_WORLD_RANK', 'OMPI_COMM_WORLD_SIZE', 'PMI_RANK', 'PMI_SIZE',
+    'SLURM_PROCID', 'SLURM_NTASKS', 'SLURM_STEP_ID', 'SLURM_STEP_NUM_TASKS']
+
+
+@pytest.fixture
+def environment(monkeypatch):
+    # Without mpi4py, from the launcher variables only
+    monkeypatch.setitem(sys.modules, 'mpi4py', None)
+    for name in launcherVariables:
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch
+
+
+def test_rankInSrunStep(environment):
+    for name, value in [('SLURM_PROCID', '3'), ('SLURM_NTASKS', '8'), ('SLURM_STEP_ID', '0'), ('SLURM_STEP_NUM_TASKS', '4')]:
+        environment.setenv(name, value)
+    assert getRankInfo() == (3, 4)
+
+
+@pytest.mark.parametrize('stepId', [None, '4294967291'])
+def test_noRankInBatchScript(environment, stepId):
+    # python main.py straight from an sbatch --ntasks=8 script
+    environment.setenv('SLURM_PROCID', '0')
+    environment.setenv('SLURM_NTASKS', '8')
+    if stepId is not None:
+        environment.setenv('SLURM_STEP_ID', stepId)
+    assert getRankInfo() == (0, 1)
@@ -0,0 +1,53 @@
+import pytest
+from numpy import random
+
+import qpaKernels
+from taskGenerator import TaskGen
+from taskAnalyser import SchedulabilityTest
+
+config = {'DEBUG': False, 'VERBOSE': False, 'epsilon': 1E-6}
+
+
+def corpus(numOfSets=300):
+    rng = random.default_rng(5)
+    taskGen = TaskGen(rng)
+    sets = list()
+    for _ in range(numOfSets):
+        taskSet = taskGen.genTask('Iterative', numOfTasks=int(rng.choice([1, 2, 3])),
+            totalUtilization=rng.choice([0.1, 0.3, 0.5, 0.7]), critProb=rng.choice([0.3, 0.5, 0.7]),
+            wcetRatio=rng.choice([0.3, 0.7]), deadlineRatio=rng.choice([0.3, 0.5, 1.0]), rate=rng.choice([0.3, 0.7]))
+        pi = int(rng.choice([10, 100, 200]))
+        thetaN = rng.choice([0.5, 0.75, 0.9])*pi
+        sets.append((taskSet, thetaN, thetaN*rng.choice([0.5, 0.75, 0.9]), pi))
+    return sets
+
+
+def solveAll(engine, busyPeriodHorizon):
+    results = list()
+    for taskSet, thetaN, thetaC, pi in corpus():
+        test = SchedulabilityTest(taskSet, thetaN, thetaC, pi,
+            dict(config, dbfEngine=engine, busyPeriodHorizon=busyPeriodHorizon))
+        test.solve()
+        results.append((test.scalingFactor, test.dbfEvaluations))
+    return results
+
+
+def checkKernel(busyPeriodHorizon):
+    kernel = solveAll('jit', busyPeriodHorizon)
+    assert kernel == solveAll('scalar', busyPeriodHorizon)
+    # Decisions through the kernel, not only pre-screens
+    assert sum(evaluations for _, evaluations in kernel) > 0
+
+
+@pytest.mark.parametrize('busyPeriodHorizon', [False, True])
+def test_kernelMatchesScalar(monkeypatch, busyPeriodHorizon):
+    # The kernels as plain Python functions when numba is missing
+    monkeypatch.setattr(qpaKernels, 'JIT_AVAILABLE', True)
+    checkKernel(busyPeriodHorizon)
+
+
+@pytest.mark.parametrize('busyPeriodHorizon', [False, True])
+def test_compiledKernelMatchesScalar(busyPeriodHorizon):
+    pytest.importorskip('numba')
+    assert qpaKernels.JIT_AVAILABLE
+    checkKernel(busyPeriodHorizon)
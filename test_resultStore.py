@@ -0,0 +1,39 @@
+import os
+import pickle
+
+import numpy
+
+from resultStore import ResultWriter, readResults, resultSchema
+
+
+class Logger(list):
+    # As in the scripts that wrote the .pkl logs
+    def __init__(self, logFolderName):
+        self.dirPathLog = os.path.join(os.getcwd(), logFolderName)
+
+    def addLog(self, **kwargs):
+        self.append(kwargs)
+
+
+def row(iteration):
+    values = {name: (iteration if dtype is numpy.int64 else 0.5) for name, dtype in resultSchema}
+    values['scalingFactor'] = iteration/4
+    return values
+
+
+def test_readLegacyLogs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    logger = Logger('logs')
+    os.makedirs(logger.dirPathLog)
+    for iteration in range(3):
+        logger.addLog(**row(iteration))
+    with open(os.path.join(logger.dirPathLog, 'log_2020_01_01_00_00_00_000000.pkl'), 'wb') as fh:
+        pickle.dump(logger, fh)
+
+    writer = ResultWriter('logs')
+    writer.addLog(**row(3))
+    writer.dumpData()
+
+    results = readResults('logs', columns=['iteration', 'scalingFactor'])
+    assert sorted(results['iteration'].tolist()) == [0, 1, 2, 3]
+    assert sorted(results['scalingFactor'].tolist()) == [0, 0.25, 0.5, 0.75]
@@ -0,0 +1,36 @@
+import numpy
+import pytest
+
+import qpaKernels
+from supplyModel import SupplyModel, PeriodicResource, ExplicitDeadlinePeriodic, BoundedDelay
+
+supplies = [PeriodicResource(10, 4), PeriodicResource(100, 49), ExplicitDeadlinePeriodic(10, 4, 8), BoundedDelay(0.4, 12)]
+
+
+@pytest.mark.parametrize('supply', supplies, ids=lambda supply: type(supply).__name__)
+def test_sbfInvAtZero(supply):
+    assert supply.sbfInv(0) == 0
+    assert supply.sbfInv(-1) == 0
+    assert supply.sbfInv(numpy.array([0.0]))[0] == 0
+
+
+@pytest.mark.parametrize('supply', supplies, ids=lambda supply: type(supply).__name__)
+def test_sbfInvIsSmallestDelta(supply):
+    values = numpy.arange(0, 200, 0.25)
+    deltas = supply.sbfInv(values)
+    assert numpy.all(supply.sbf(deltas) >= values - 1E-9)
+    assert numpy.all((values <= 0) | (supply.sbf(deltas - 1E-6) < values))
+    assert numpy.array_equal(deltas, [supply.sbfInv(value) for value in values])
+
+
+def test_sbfInvKernelAtZero():
+    assert qpaKernels.sbfInvKernel(0.0, 10, 4) == PeriodicResource(10, 4).sbfInv(0) == 0
+
+
+def test_supplyModelIsAbstract():
+    class Incomplete(SupplyModel):
+        def sbf(self, delta):
+            return delta
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,64 @@
+import numpy
+from numpy import random
+
+from taskGenerator import TaskGen, TaskSet
+from taskAnalyser import SchedulabilityTest, analyseBatch
+
+config = {'DEBUG': False, 'VERBOSE': False, 'epsilon': 1E-6}
+
+
+def case1051(busyPeriodHorizon):
+    # Three HI tasks whose busy period for condition C ends before every
+    # real deadline
+    taskSet = TaskSet(wcetLO=[126, 25, 142], wcetHI=[252, 50, 284], period=[970, 820, 918],
+        deadline=[873, 738, 826], isHI=[True]*3)
+    return SchedulabilityTest(taskSet, 70, 49, 100, dict(config, busyPeriodHorizon=busyPeriodHorizon))
+
+
+def corpus(numOfSets=300):
+    rng = random.default_rng(7)
+    taskGen = TaskGen(rng)
+    sets = list()
+    for _ in range(numOfSets):
+        taskSet = taskGen.genTask('Iterative', numOfTasks=int(rng.choice([1, 2, 3])),
+            totalUtilization=rng.choice([0.1, 0.3, 0.5, 0.7]), critProb=rng.choice([0.3, 0.5, 0.7]),
+            wcetRatio=rng.choice([0.3, 0.7]), deadlineRatio=rng.choice([0.3, 0.5, 1.0]), rate=rng.choice([0.3, 0.7]))
+        sets.append(taskSet)
+    return sets
+
+
+def solve(taskSet, pi, thetaN, thetaC, **options):
+    test = SchedulabilityTest(taskSet, thetaN, thetaC, pi, dict(config, **options))
+    test.solve()
+    return test.scalingFactor
+
+
+def test_case1051():
+    bound, busy = case1051(False), case1051(True)
+    bound._setScaling(0.125)
+    bound._calcL()
+    busy._setScaling(0.125)
+    busy._calcL()
+    assert busy.lSources['C'] == 'busyPeriod'
+    assert busy.lC < bound.lC
+
+    # Condition C fails at the virtual deadline of the second task, before
+    # the first real deadline, and both horizons see it
+    failures = [t for t in numpy.arange(0, bound.lC, 0.25) if int(bound._dbf_CndC(t)) > int(bound.supplyC.sbf(t))]
+    assert failures and failures[0] < min(task.deadline for task in bound.tasksHI)
+    assert not bound._calcCndnC() and not busy._calcCndnC()
+
+    bound.solve()
+    busy.solve()
+    assert bound.scalingFactor == busy.scalingFactor < 0
+
+
+def test_busyPeriodHorizonSameScalingFactors():
+    # The busy-period horizon only shortens the QPA, the decisions stay
+    sets = corpus()
+    for pi, budgetUtil in [(10, 0.5), (100, 0.75), (200, 0.9)]:
+        thetaN, thetaC = budgetUtil*pi, 0.75*budgetUtil*pi
+        bound = [solve(taskSet, pi, thetaN, thetaC) for taskSet in sets]
+        busy = [solve(taskSet, pi, thetaN, thetaC, busyPeriodHorizon=True) for taskSet in sets]
+        assert bound == busy
+        assert bound == analyseBatch(sets, thetaN, thetaC, pi).tolist()
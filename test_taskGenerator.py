@@ -0,0 +1,42 @@
+import numpy
+from numpy import random
+
+from taskGenerator import TaskGen
+
+parameters = dict(critProb=0.5, wcetRatio=0.5, deadlineRatio=1.0, rate=0.5)
+
+
+def batchUtilizations(numOfTasks, totalUtilization, count=2000, **kwargs):
+    columns = TaskGen(random.default_rng(1)).genTaskBatch('Iterative', count, asArrays=True,
+        numOfTasks=numOfTasks, totalUtilization=totalUtilization, **parameters, **kwargs)
+    return columns['utilizationHI'][columns['valid']], columns
+
+
+def test_batchMatchesScalarUpToFiveTasks():
+    # Same per-task cap of 0.8, so the same distribution as the scalar
+    # generator
+    taskGen = TaskGen(random.default_rng(2))
+    scalar = list()
+    sizes = list()
+    for _ in range(2000):
+        utilHi = taskGen._getUtilizationsIterative(0.7, 0.5, minTasks=3, probHi=0.5, buffer=0.025)['utilHi']
+        scalar.extend(utilHi)
+        sizes.append(len(utilHi))
+    batch, columns = batchUtilizations(3, 0.7)
+    assert batch.max() <= 0.8 and max(scalar) <= 0.8
+    assert abs(batch.mean() - numpy.mean(scalar)) < 0.01
+    assert abs(columns['numOfTasks'].mean() - numpy.mean(sizes)) < 0.05
+
+
+def test_batchCapAboveFiveTasks():
+    # Above 5 tasks the default cap is min(0.8, 2*totalUtilization/numOfTasks)
+    batch, columns = batchUtilizations(20, 1.0, count=500)
+    assert (columns['numOfTasks'] >= 20).all()
+    assert batch.max() <= 2*1.0/20
+    utilAvg = 0.5*(columns['utilizationLO'].sum(axis=1) + columns['utilizationHI'].sum(axis=1))
+    assert ((utilAvg >= 1.0 - 0.025) & (utilAvg <= 1.0 + 0.025)).all()
+
+    # maxTaskUtil restores the cap of the scalar generator
+    capped, _ = batchUtilizations(6, 2.0, count=500)
+    original, _ = batchUtilizations(6, 2.0, count=500, maxTaskUtil=0.8)
+    assert capped.max() <= 2*2.0/6 < original.max() <= 0.8